@@ -5,6 +5,9 @@ class DeckSettings(BaseSettings):
     # Deck extractor settings
     EXTRACTOR_BASE_URL: str
 
+    # Page discovery settings, pages are fetched until one comes back empty
+    PAGE_WORKERS: int
+
     # Http client settings
     READ_TIMEOUT: int
     CONNECT_TIMEOUT: int
@@ -15,20 +18,27 @@ class DeckSettings(BaseSettings):
     EXPONENTIAL_MAX_WAIT: int
     EXPONENTIAL_MULTIPLIER: int
 
-    # Aiometer settings
-    AIOMETER_MAX_CONCURRENT: int
-    AIOMETER_MAX_PER_SECOND: int
+    # Adaptive limiter settings, the maximums are hard caps
+    LIMITER_INITIAL_CONCURRENT: int
+    LIMITER_MAX_CONCURRENT: int
+    LIMITER_INITIAL_PER_SECOND: float
+    LIMITER_MAX_PER_SECOND: float
+    LIMITER_LATENCY_TARGET: float
 
 
 deck_settings = DeckSettings(
     EXTRACTOR_BASE_URL="https://formatlibrary.com/api/decks",
+    PAGE_WORKERS=4,
     READ_TIMEOUT=5,
     CONNECT_TIMEOUT=5,
     MAX_RETRIES=2,
     EXPONENTIAL_MIN_WAIT=2,
     EXPONENTIAL_MAX_WAIT=8,
     EXPONENTIAL_MULTIPLIER=2,
-    AIOMETER_MAX_CONCURRENT=100,
-    AIOMETER_MAX_PER_SECOND=50,
+    LIMITER_INITIAL_CONCURRENT=20,
+    LIMITER_MAX_CONCURRENT=100,
+    LIMITER_INITIAL_PER_SECOND=10,
+    LIMITER_MAX_PER_SECOND=50,
+    LIMITER_LATENCY_TARGET=2,
 )
 5
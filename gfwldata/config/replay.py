@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -20,7 +22,31 @@ class ReplaySettings(BaseSettings):
     S3_PREFIX: str = Field(
         description="The prefix, or folder, of the replay files in s3"
     )
+    S3_FILETYPE: Literal["json", "json.gz", "json.zst"] = Field(
+        description="Filetype replays are uploaded as, compressed unless it's plain 'json'"
+    )
     PAGE_TIMEOUT: int = Field(description="Playwright's page timeout in milliseconds")
+    CAPTURE_MODE: Literal["dom", "network"] = Field(
+        description="'network' captures the replay as soon as it arrives, 'dom' waits for the cards to render"
+    )
+    BLOCKED_RESOURCE_TYPES: list[str] = Field(
+        description="Resource types not loaded by pages in the 'network' capture mode"
+    )
+    REPLAY_RESPONSE_URL_PATTERN: str | None = Field(
+        default=None,
+        description="Regex of the url of the response holding the replay JSON, if any",
+    )
+
+    # Browser pool settings
+    BROWSER_POOL_SIZE: int = Field(
+        description="The number of scraping browser connections kept open"
+    )
+    PAGES_PER_BROWSER: int = Field(
+        description="The number of pages kept open on each browser connection"
+    )
+    PAGE_MAX_USES: int = Field(
+        description="The number of replays a page loads before it's replaced"
+    )
 
     # Retry settings
     MAX_RETRIES: int
@@ -28,19 +54,53 @@ class ReplaySettings(BaseSettings):
     EXPONENTIAL_MAX_WAIT: int
     EXPONENTIAL_MULTIPLIER: int
 
-    # Aiometer settings
-    AIOMETER_MAX_CONCURRENT: int
-    AIOMETER_MAX_PER_SECOND: int
+    # Adaptive limiter settings, the maximums are hard caps
+    LIMITER_INITIAL_CONCURRENT: int
+    LIMITER_MAX_CONCURRENT: int
+    LIMITER_INITIAL_PER_SECOND: float
+    LIMITER_MAX_PER_SECOND: float
+    LIMITER_LATENCY_TARGET: float = Field(
+        description="Seconds a scrape may take before the limiter backs off"
+    )
+
+    # Job leasing settings
+    LEASE_SECONDS: float = Field(
+        description="Seconds a claimed job stays leased without a heartbeat before other workers may reclaim it"
+    )
+    LEASE_CLAIM_SIZE: int = Field(
+        description="The number of jobs claimed at a time by the scraper"
+    )
+
+    # Job state writer settings
+    JOB_STATE_BATCH_SIZE: int = Field(
+        description="The number of job state transitions that triggers a write"
+    )
+    JOB_STATE_FLUSH_INTERVAL: float = Field(
+        description="Seconds buffered job state transitions wait before being written"
+    )
 
 
 replay_settings = ReplaySettings(
     SCREENSHOT_DIR="gfwldata/data/screenshots",
     S3_PREFIX="replays/",
+    S3_FILETYPE="json.gz",
     PAGE_TIMEOUT=1000 * 60,
+    CAPTURE_MODE="network",
+    BLOCKED_RESOURCE_TYPES=["image", "font", "media", "stylesheet"],
+    BROWSER_POOL_SIZE=5,
+    PAGES_PER_BROWSER=6,
+    PAGE_MAX_USES=20,
     MAX_RETRIES=3,
     EXPONENTIAL_MIN_WAIT=2,
     EXPONENTIAL_MAX_WAIT=16,
     EXPONENTIAL_MULTIPLIER=2,
-    AIOMETER_MAX_CONCURRENT=30,
-    AIOMETER_MAX_PER_SECOND=2,
+    LIMITER_INITIAL_CONCURRENT=10,
+    LIMITER_MAX_CONCURRENT=30,
+    LIMITER_INITIAL_PER_SECOND=2,
+    LIMITER_MAX_PER_SECOND=5,
+    LIMITER_LATENCY_TARGET=30,
+    LEASE_SECONDS=300,
+    LEASE_CLAIM_SIZE=200,
+    JOB_STATE_BATCH_SIZE=500,
+    JOB_STATE_FLUSH_INTERVAL=5,
 )
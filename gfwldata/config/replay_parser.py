@@ -2,18 +2,78 @@ from pydantic import BaseModel, Field
 
 
 class ReplayParserSettings(BaseModel):
-    # Replay parser settings
+    # Deck classifier artifacts, as saved from the deck model notebook
     LABEL_ENCODER_PATH: str = Field()
     VECTORIZER_PATH: str = Field()
     MODEL_PATH: str = Field()
 
+    # Deck classifier artifacts, as exported by scripts.export_deck_classifier
+    CLASSES_PATH: str = Field(description="Label encoder classes saved as .npy")
+    VOCABULARY_PATH: str = Field(
+        description="Tf-idf vocabulary saved as .npy, ordered by feature index"
+    )
+    IDF_PATH: str = Field(description="Tf-idf idf weights saved as .npy")
+    BOOSTER_PATH: str = Field(description="XGBoost booster in its native format")
+
+    # Replay parser settings
+    PREDICTION_CACHE_SIZE: int = Field(
+        description="The maximum number of deck type predictions kept in each parser's LRU cache"
+    )
+
     # Multiprocessing
     MP_PROCESSES: int = Field()
+    MP_CHUNK_SIZE: int = Field(
+        description="The number of replays a worker parses before running deck type predictions as one batch"
+    )
+    MP_IMAP_CHUNKSIZE: int = Field(
+        description="The number of job chunks handed to a worker at a time by imap_unordered"
+    )
+
+    # S3
+    S3_PREFETCH_WINDOW: int = Field(
+        description="The maximum number of replays downloading or downloaded ahead of the parser workers"
+    )
+
+    # Replay archive
+    ARCHIVE_DIR: str = Field(
+        description="Local directory of archived replay segments, read through memory maps"
+    )
+    ARCHIVE_S3_PREFIX: str = Field(
+        description="The prefix, or folder, of the archived replay segments and indexes in s3"
+    )
+    ARCHIVE_SEGMENT_BYTES: int = Field(
+        description="The size a segment grows to before compaction starts the next one"
+    )
+
+    # Database
+    DB_PAGE_SIZE: int = Field(
+        description="The number of pending jobs read from the database per page"
+    )
+    DB_WRITE_BATCH_SIZE: int = Field(
+        description="The number of games inserted per transaction by the pipeline's single writer"
+    )
+    LEASE_SECONDS: float = Field(
+        description="Seconds a claimed job stays leased without a heartbeat before other workers may reclaim it"
+    )
 
 
 replay_parser_settings = ReplayParserSettings(
     LABEL_ENCODER_PATH="gfwldata/models/deck_classifier/label_encoder.joblib",
     VECTORIZER_PATH="gfwldata/models/deck_classifier/tfidf.joblib",
     MODEL_PATH="gfwldata/models/deck_classifier/xgboost_model.joblib",
+    CLASSES_PATH="gfwldata/models/deck_classifier/classes.npy",
+    VOCABULARY_PATH="gfwldata/models/deck_classifier/vocabulary.npy",
+    IDF_PATH="gfwldata/models/deck_classifier/idf.npy",
+    BOOSTER_PATH="gfwldata/models/deck_classifier/xgboost_model.ubj",
+    PREDICTION_CACHE_SIZE=50_000,
     MP_PROCESSES=18,
+    MP_CHUNK_SIZE=25,
+    MP_IMAP_CHUNKSIZE=1,
+    S3_PREFETCH_WINDOW=1000,
+    ARCHIVE_DIR="gfwldata/data/replay_archive",
+    ARCHIVE_S3_PREFIX="archives/",
+    ARCHIVE_SEGMENT_BYTES=256 * 1024**2,
+    DB_PAGE_SIZE=1000,
+    DB_WRITE_BATCH_SIZE=5000,
+    LEASE_SECONDS=300,
 )
@@ -25,5 +25,22 @@ class Settings(BaseSettings):
         description="Required for aws s3 authentification"
     )
 
+    # Local s3 object cache
+    S3_CACHE_ENABLED: bool = Field(
+        default=False, description="Serve repeated s3 object reads from a local cache"
+    )
+    S3_CACHE_DIR: str = Field(
+        default="gfwldata/data/s3_cache",
+        description="Directory of the local s3 object cache",
+    )
+    S3_CACHE_MAX_BYTES: int = Field(
+        default=1024**3,
+        description="Compressed size the local s3 object cache is evicted down to",
+    )
+    S3_CACHE_REVALIDATE: bool = Field(
+        default=False,
+        description="Check cached ETags against s3 with a HEAD request before each read",
+    )
+
 
 settings = Settings()
@@ -0,0 +1,133 @@
+import asyncio
+import contextlib
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from playwright.async_api import Browser, Page, Playwright, Route
+
+from gfwldata.config.replay import ReplaySettings
+
+logger = logging.getLogger(__name__)
+
+
+class _BrowserSlot:
+    """A CDP connection, shared by the pages opened on it."""
+
+    def __init__(self):
+        self.browser: Browser | None = None
+        self.lock = asyncio.Lock()
+
+
+class _PageSlot:
+    """A reusable page and the number of replays it has loaded."""
+
+    def __init__(self, browser_slot: _BrowserSlot):
+        self.browser_slot = browser_slot
+        self.page: Page | None = None
+        self.uses = 0
+
+
+class BrowserPool:
+    """Keeps CDP connections and pages alive across replay scrapes."""
+
+    def __init__(
+        self,
+        config: ReplaySettings,
+        playwright_client: Playwright,
+        blocked_resource_types: list[str] | None = None,
+    ):
+        self.config = config
+        self.playwright_client = playwright_client
+        self.blocked_resource_types = frozenset(blocked_resource_types or ())
+
+        self._browser_slots = [_BrowserSlot() for _ in range(config.BROWSER_POOL_SIZE)]
+        self._idle_pages: asyncio.Queue[_PageSlot] = asyncio.Queue()
+
+        # Pages are opened on first use, so the pool connects lazily
+        for browser_slot in self._browser_slots:
+            for _ in range(config.PAGES_PER_BROWSER):
+                self._idle_pages.put_nowait(_PageSlot(browser_slot))
+
+    async def __aenter__(self) -> "BrowserPool":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    @asynccontextmanager
+    async def acquire_page(self) -> AsyncIterator[Page]:
+        """Borrow a page, waiting for one to be free if they're all in use."""
+        page_slot = await self._idle_pages.get()
+
+        try:
+            if page_slot.page is None:
+                page_slot.page = await self._new_page(page_slot.browser_slot)
+
+            yield page_slot.page
+
+            # Pages are replaced after PAGE_MAX_USES scrapes
+            page_slot.uses += 1
+            if page_slot.uses >= self.config.PAGE_MAX_USES:
+                await self._recycle_page(page_slot)
+
+        except BaseException:
+            # The page may be left mid-navigation or broken, so never reuse it
+            await self._recycle_page(page_slot)
+            raise
+
+        finally:
+            self._idle_pages.put_nowait(page_slot)
+
+    async def close(self) -> None:
+        """Close every open page and connection."""
+        while not self._idle_pages.empty():
+            await self._recycle_page(self._idle_pages.get_nowait())
+
+        for browser_slot in self._browser_slots:
+            if browser_slot.browser is not None:
+                with contextlib.suppress(Exception):
+                    await browser_slot.browser.close()
+                browser_slot.browser = None
+
+    async def _new_page(self, browser_slot: _BrowserSlot) -> Page:
+        """Open a page on the slot's connection, connecting first if needed."""
+        async with browser_slot.lock:
+            # A dropped connection is reopened by the next page that needs it
+            if browser_slot.browser is None or not browser_slot.browser.is_connected():
+                logger.info("Connecting to the scraping browser")
+                browser_slot.browser = (
+                    await self.playwright_client.chromium.connect_over_cdp(
+                        endpoint_url=self.config.SBR_WS_ENDPOINT
+                    )
+                )
+
+            page = await browser_slot.browser.new_page()
+
+        # Routes apply to every navigation, so one install is enough
+        if self.blocked_resource_types:
+            try:
+                await page.route("**/*", self._block_resources)
+            except Exception:
+                with contextlib.suppress(Exception):
+                    await page.close()
+                raise
+
+        return page
+
+    async def _block_resources(self, route: Route) -> None:
+        """Abort requests for resources the scrape doesn't need."""
+        if route.request.resource_type in self.blocked_resource_types:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    @staticmethod
+    async def _recycle_page(page_slot: _PageSlot) -> None:
+        """Close the slot's page, so a fresh one is opened on its next use."""
+        if page_slot.page is not None:
+            with contextlib.suppress(Exception):
+                await page_slot.page.close()
+
+        page_slot.page = None
+        page_slot.uses = 0
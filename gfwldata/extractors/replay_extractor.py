@@ -1,96 +1,214 @@
+import asyncio
 import json
 import logging
+import re
+from contextlib import contextmanager
+from typing import Iterator
 from urllib.parse import parse_qs, urlparse
 
-from playwright.async_api import Page, Playwright, TimeoutError
+from playwright.async_api import ConsoleMessage, Page, TimeoutError
 
 from gfwldata.config.replay import ReplaySettings
+from gfwldata.extractors.browser_pool import BrowserPool
 
 logger = logging.getLogger(__name__)
 
 
-INIT_SCRIPT = """
-    window.consoleLogs = [];
-    const originalLog = console.log;
-    console.log = function() {
-        window.consoleLogs.push(Array.from(arguments).join(' '));
-        originalLog.apply(console, arguments);
-    };
-"""
+# Replay JSON is logged as one object, so most console messages fail these cheaply
+CONSOLE_PAYLOAD_PREFIX = "{"
+CONSOLE_PAYLOAD_MARKER = '"conceal"'
+
+BLANK_PAGE_URL = "about:blank"
 
 
 class ReplayExtractor:
     """Extracts replay JSON from duelingbook replays."""
 
-    def __init__(self, config: ReplaySettings, playwright_client: Playwright):
+    def __init__(self, config: ReplaySettings, browser_pool: BrowserPool):
         self.config = config
-        self.playwright_client = playwright_client
+        self.browser_pool = browser_pool
+        self.response_url_pattern = (
+            re.compile(config.REPLAY_RESPONSE_URL_PATTERN)
+            if config.REPLAY_RESPONSE_URL_PATTERN
+            else None
+        )
 
     async def extract_replay_json(self, replay_url: str) -> dict | None:
         """Extracts replay JSON from the replay url."""
+        replay_id = self._get_replay_id(replay_url)
+
+        async with self.browser_pool.acquire_page() as page:
+            try:
+                # A pooled page still runs the previous scrape's replay, so unload
+                # it before listening, or its messages could be taken for this one
+                if page.url != BLANK_PAGE_URL:
+                    await page.goto(BLANK_PAGE_URL, timeout=self.config.PAGE_TIMEOUT)
+
+                with self._listen_for_console_payload(
+                    page, replay_id
+                ) as console_payload:
+                    if self.config.CAPTURE_MODE == "network":
+                        waiter = self._capture_replay_json(
+                            page, replay_url, replay_id, console_payload
+                        )
+                    else:
+                        waiter = self._load_replay_json(
+                            page, replay_url, console_payload
+                        )
+
+                    async with asyncio.timeout(self.config.PAGE_TIMEOUT / 1000):
+                        replay_json = await waiter
+
+                if not replay_json:
+                    raise ReplayExtractionError("Replay JSON not found")
+
+                return replay_json
+
+            except TimeoutError:
+                logger.error("Timeout while loading replay URL: %s", replay_url)
+                await self._take_screenshot_of_page(page, replay_url)
+                raise
+
+            except asyncio.TimeoutError as e:
+                logger.error("Timeout waiting for replay JSON, URL: %s", replay_url)
+                await self._take_screenshot_of_page(page, replay_url)
+                raise ReplayExtractionError("Timeout waiting for replay JSON") from e
 
-        # Initialize browser and page
-        browser = await self.playwright_client.chromium.connect_over_cdp(
-            endpoint_url=self.config.SBR_WS_ENDPOINT
+            except Exception:
+                logger.exception(
+                    "Error during extraction of replay JSON for URL: %s", replay_url
+                )
+                await self._take_screenshot_of_page(page, replay_url)
+                raise
+
+    @contextmanager
+    def _listen_for_console_payload(
+        self, page: Page, replay_id: int
+    ) -> Iterator[asyncio.Future]:
+        """Yields a future resolved by the first console message holding the replay."""
+        console_payload = asyncio.get_running_loop().create_future()
+
+        def on_console(message: ConsoleMessage) -> None:
+            if console_payload.done():
+                return
+
+            replay_json = self._parse_console_payload(message.text)
+            if self._is_replay(replay_json, replay_id):
+                console_payload.set_result(replay_json)
+
+        # Pages are pooled, so the listener only lives as long as this scrape
+        page.on("console", on_console)
+        try:
+            yield console_payload
+        finally:
+            page.remove_listener("console", on_console)
+            console_payload.cancel()
+
+    async def _load_replay_json(
+        self, page: Page, replay_url: str, console_payload: asyncio.Future
+    ) -> dict:
+        """Loads the replay until its cards render, then takes the logged replay."""
+        logger.info("Navigating to replay URL: %s", replay_url)
+        await page.goto(
+            url=replay_url,
+            timeout=self.config.PAGE_TIMEOUT,
+            wait_until="domcontentloaded",
         )
-        page = await browser.new_page()
 
-        # Inject console logger to capture all logs
-        await page.add_init_script(INIT_SCRIPT)
+        logger.info("Page loaded, awaiting card element for URL: %s", replay_url)
+        await page.locator("div.card").first.wait_for(timeout=self.config.PAGE_TIMEOUT)
+
+        return await console_payload
+
+    async def _capture_replay_json(
+        self,
+        page: Page,
+        replay_url: str,
+        replay_id: int,
+        console_payload: asyncio.Future,
+    ) -> dict | None:
+        """
+        Captures the replay JSON as soon as the page receives it.
+
+        Takes the first console message holding the replay or, if
+        REPLAY_RESPONSE_URL_PATTERN is set, a matching network response,
+        whichever has the replay first. Nothing waits for the DOM.
+        """
+        # Listen for the response before navigating, so it can't be missed
+        waiters = [console_payload]
+        if self.response_url_pattern is not None:
+            waiters.append(
+                asyncio.create_task(self._wait_for_response_payload(page, replay_id))
+            )
 
         try:
             logger.info("Navigating to replay URL: %s", replay_url)
             await page.goto(
-                url=replay_url,
-                timeout=self.config.PAGE_TIMEOUT,
-                wait_until="domcontentloaded",
+                url=replay_url, timeout=self.config.PAGE_TIMEOUT, wait_until="commit"
             )
 
-            logger.info("Page loaded, awaiting card element for URL: %s", replay_url)
-            await page.locator("div.card").first.wait_for(
-                timeout=self.config.PAGE_TIMEOUT
-            )
+            pending = set(waiters)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
 
-            # Get logs from console logger
-            console_logs = await page.evaluate("window.consoleLogs")
+                for waiter in done:
+                    if waiter.exception() is None and waiter.result():
+                        return waiter.result()
 
-            if not console_logs:
-                logger.error("No console logs captured for URL: %s", replay_url)
-                await self._take_screenshot_of_page(page, replay_url)
-                return
-
-            replay_json = self._extract_json_from_logs(console_logs)
+            # Every waiter failed, so surface the first failure
+            for waiter in waiters:
+                if waiter.exception() is not None:
+                    raise waiter.exception()
 
-            if not replay_json:
-                raise ReplayExtractionError("Replay JSON not found in console logs")
+        finally:
+            for waiter in waiters[1:]:
+                waiter.cancel()
+
+            # Retrieve cancelled or failed waiters' results, so none go unobserved
+            await asyncio.gather(*waiters[1:], return_exceptions=True)
+
+    async def _wait_for_response_payload(
+        self, page: Page, replay_id: int
+    ) -> dict | None:
+        """Waits for a response matching REPLAY_RESPONSE_URL_PATTERN and reads its JSON."""
+        response = await page.wait_for_event(
+            "response",
+            predicate=lambda response: self.response_url_pattern.search(response.url),
+            timeout=self.config.PAGE_TIMEOUT,
+        )
+        data = await response.json()
 
-            return replay_json
+        if isinstance(data, dict) and data.get("conceal") is False:
+            return data if self._is_replay(data, replay_id) else None
 
-        except TimeoutError:
-            logger.error("Timeout while loading replay URL: %s", replay_url)
-            await self._take_screenshot_of_page(page, replay_url)
-            raise
+    @staticmethod
+    def _parse_console_payload(text: str) -> dict | None:
+        """Decodes a console message if it's the replay JSON."""
+        if (
+            not text.startswith(CONSOLE_PAYLOAD_PREFIX)
+            or CONSOLE_PAYLOAD_MARKER not in text
+        ):
+            return None
 
-        except Exception:
-            logger.exception(
-                "Error during extraction of replay JSON for URL: %s", replay_url
-            )
-            await self._take_screenshot_of_page(page, replay_url)
-            raise
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            return None
 
-        finally:
-            await page.close()
-            await browser.close()
+        if isinstance(data, dict) and data.get("conceal") is False:
+            return data
 
-    def _extract_json_from_logs(self, console_logs: list[str]) -> dict | None:
-        """Extracts replay JSON from a list of console logs."""
-        for log in console_logs:
-            try:
-                data = json.loads(log)
-                if isinstance(data, dict) and data.get("conceal") is False:
-                    return data
-            except json.JSONDecodeError:
-                continue
+    @staticmethod
+    def _is_replay(replay_json: dict | None, replay_id: int) -> bool:
+        """Whether a decoded payload can be the replay with replay_id."""
+        if replay_json is None:
+            return False
+
+        # Payloads aren't known to carry their id, only a different one rules it out
+        payload_id = replay_json.get("id")
+        return payload_id is None or str(payload_id) == str(replay_id)
 
     async def _take_screenshot_of_page(self, page: Page, replay_url: str) -> None:
         """Takes a screenshot of the page at the given replay URL."""
@@ -0,0 +1,117 @@
+import logging
+from uuid import UUID
+
+from sqlalchemy import Connection, Engine, delete, insert, update
+
+from gfwldata.utils.models import Game, Job, JobState
+
+logger = logging.getLogger(__name__)
+
+
+class GameLoader:
+    """Buffers parsed game rows and bulk inserts them into the database in batches."""
+
+    def __init__(self, engine: Engine, batch_size: int, lease_owner: str | None = None):
+        """
+        Initializes the GameLoader with a database engine and batch size.
+
+        With a lease_owner, job states are only written for jobs the worker
+        still holds, and their leases are cleared.
+        """
+        self.engine = engine
+        self.batch_size = batch_size
+        self.lease_owner = lease_owner
+        self.game_rows: list[dict] = []
+        self.completed_ids: list[UUID] = []
+        self.failed_ids: list[UUID] = []
+
+    def add(
+        self,
+        game_rows: list[dict],
+        completed_ids: list[UUID],
+        failed_ids: list[UUID],
+    ) -> None:
+        """
+        Buffers the results of parsed jobs, writing a batch once the buffer is full.
+
+        game_rows must hold every game of the completed league matches, since
+        a league match's games are replaced as a whole.
+        """
+        self.game_rows.extend(game_rows)
+        self.completed_ids.extend(completed_ids)
+        self.failed_ids.extend(failed_ids)
+
+        if (
+            len(self.game_rows) >= self.batch_size
+            or len(self.completed_ids) + len(self.failed_ids) >= self.batch_size
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes every buffered game and job state in one transaction."""
+        if not (self.game_rows or self.completed_ids or self.failed_ids):
+            return
+
+        game_rows, self.game_rows = self.game_rows, []
+        completed_ids, self.completed_ids = self.completed_ids, []
+        failed_ids, self.failed_ids = self.failed_ids, []
+
+        with self.engine.begin() as connection:
+            # Jobs are updated first, so games are only written for jobs still held
+            held_ids = {
+                state: self._set_job_states(connection, state, league_match_ids)
+                for state, league_match_ids in (
+                    (JobState.PARSER_COMPLETED, completed_ids),
+                    (JobState.PARSER_FAILED, failed_ids),
+                )
+            }
+            held_completed_ids = held_ids[JobState.PARSER_COMPLETED]
+            held_game_rows = [
+                row for row in game_rows if row["league_match_id"] in held_completed_ids
+            ]
+
+            # Replace, rather than duplicate, games of league matches parsed before
+            if held_completed_ids:
+                connection.execute(
+                    delete(Game.__table__).where(
+                        Game.league_match_id.in_(held_completed_ids)
+                    )
+                )
+
+            # Core insert skips the ORM unit of work; column defaults still apply
+            if held_game_rows:
+                connection.execute(insert(Game.__table__), held_game_rows)
+
+        lost_ids = (
+            len(completed_ids) + len(failed_ids) - sum(map(len, held_ids.values()))
+        )
+        if lost_ids:
+            logger.warning(
+                "Skipped %s jobs whose lease was taken over by another worker",
+                lost_ids,
+            )
+
+        logger.info(
+            "Inserted %s games, %s jobs completed, %s jobs failed",
+            len(held_game_rows),
+            len(held_completed_ids),
+            len(held_ids[JobState.PARSER_FAILED]),
+        )
+
+    def _set_job_states(
+        self, connection: Connection, state: JobState, league_match_ids: list[UUID]
+    ) -> set[UUID]:
+        """Sets the state of jobs this worker holds, returning their ids."""
+        if not league_match_ids:
+            return set()
+
+        statement = (
+            update(Job.__table__)
+            .where(Job.league_match_id.in_(league_match_ids))
+            .values(state=state, lease_owner=None, lease_expires_at=None)
+            .returning(Job.league_match_id)
+        )
+        if self.lease_owner is not None:
+            statement = statement.where(Job.lease_owner == self.lease_owner)
+
+        return set(connection.execute(statement).scalars())
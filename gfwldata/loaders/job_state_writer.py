@@ -0,0 +1,114 @@
+import asyncio
+import logging
+from collections import defaultdict
+from uuid import UUID
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from gfwldata.utils.models import Job, JobState
+
+logger = logging.getLogger(__name__)
+
+
+class JobStateWriter:
+    """Single writer of the job state transitions sent by concurrent tasks."""
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        batch_size: int,
+        flush_interval: float,
+        lease_owner: str | None = None,
+    ):
+        """Initializes the JobStateWriter with a database engine and flush limits."""
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lease_owner = lease_owner
+
+        self.states: dict[UUID, JobState] = {}
+        self._queue: asyncio.Queue[tuple[UUID, JobState] | None] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "JobStateWriter":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    def set_state(self, league_match_id: UUID, state: JobState) -> None:
+        """Queues a job's state transition for the writer task."""
+        self._queue.put_nowait((league_match_id, state))
+
+    async def close(self) -> None:
+        """Stops the writer task once every queued transition is written."""
+        if self._task is None:
+            return
+
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+
+        while True:
+            try:
+                item = await asyncio.wait_for(
+                    self._queue.get(), max(0, deadline - loop.time())
+                )
+            except asyncio.TimeoutError:
+                item = None
+            else:
+                # None is queued by close, once every task is done
+                if item is None:
+                    await self._flush_logged()
+                    return
+
+            # A later transition of a job replaces one that isn't written yet
+            if item is not None:
+                league_match_id, state = item
+                self.states[league_match_id] = state
+
+            if len(self.states) >= self.batch_size or loop.time() >= deadline:
+                await self._flush_logged()
+                deadline = loop.time() + self.flush_interval
+
+    async def _flush_logged(self) -> None:
+        """Flushes, keeping the writer alive and the batch buffered on errors."""
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("Failed to write %s job states", len(self.states))
+
+    async def flush(self) -> None:
+        """Writes every buffered transition in one transaction."""
+        if not self.states:
+            return
+
+        ids_by_state = defaultdict(list)
+        for league_match_id, state in self.states.items():
+            ids_by_state[state].append(league_match_id)
+
+        async with self.engine.begin() as connection:
+            for state, league_match_ids in ids_by_state.items():
+                statement = (
+                    update(Job.__table__)
+                    .where(Job.league_match_id.in_(league_match_ids))
+                    .values(state=state, lease_owner=None, lease_expires_at=None)
+                )
+                # Jobs whose lease went to another worker are theirs to write
+                if self.lease_owner is not None:
+                    statement = statement.where(Job.lease_owner == self.lease_owner)
+
+                await connection.execute(statement)
+
+        logger.info(
+            "Wrote %s job states: %s",
+            len(self.states),
+            {state.name: len(ids) for state, ids in ids_by_state.items()},
+        )
+        self.states.clear()
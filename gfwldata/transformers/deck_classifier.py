@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import xgboost as xgb
+from scipy.sparse import coo_matrix, csr_matrix
+
+from gfwldata.config.replay_parser import ReplayParserSettings
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionCache:
+    """Bounded LRU cache of deck type predictions with hit and miss counters."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._predictions: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    def get(self, key: str) -> tuple[str, float] | None:
+        """Get a cached prediction and mark it as most recently used."""
+        prediction = self._predictions.get(key)
+
+        if prediction is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._predictions.move_to_end(key)
+        return prediction
+
+    def put(self, key: str, prediction: tuple[str, float]) -> None:
+        """Cache a prediction, evicting the least recently used when full."""
+        if self.max_size <= 0:
+            return
+
+        self._predictions[key] = prediction
+        self._predictions.move_to_end(key)
+
+        if len(self._predictions) > self.max_size:
+            self._predictions.popitem(last=False)
+
+    def info(self) -> dict[str, int | float]:
+        """Cache counters, used to size PREDICTION_CACHE_SIZE."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self._predictions),
+            "max_size": self.max_size,
+        }
+
+
+class DeckClassifier:
+    """Predicts deck types from the cards a player revealed in a replay."""
+
+    def __init__(self, config: ReplayParserSettings):
+        self.config = config
+        artifact_paths = [
+            self.config.CLASSES_PATH,
+            self.config.VOCABULARY_PATH,
+            self.config.IDF_PATH,
+            self.config.BOOSTER_PATH,
+        ]
+
+        missing_paths = [path for path in artifact_paths if not Path(path).exists()]
+        if missing_paths:
+            raise FileNotFoundError(
+                f"Deck classifier artifacts are missing: {missing_paths}. "
+                "Export them from the deck model with `make model-export`."
+            )
+
+        # Memory-map the exported arrays, so parser processes share their pages
+        self.classes = np.load(self.config.CLASSES_PATH, mmap_mode="r")
+        self.idf = np.load(self.config.IDF_PATH, mmap_mode="r")
+
+        # Lowercased card names ordered by tf-idf feature index, which
+        # TfidfVectorizer sorts, so a card's index is found by binary search
+        self.vocabulary = np.load(self.config.VOCABULARY_PATH, mmap_mode="r")
+        if np.any(self.vocabulary[:-1] >= self.vocabulary[1:]):
+            raise ValueError(
+                f"{self.config.VOCABULARY_PATH} isn't sorted, "
+                "re-export it with `make model-export`."
+            )
+
+        self.booster = xgb.Booster(model_file=self.config.BOOSTER_PATH)
+
+        # Cache keys include the artifacts' fingerprint, so a retrained model never
+        # serves predictions from the previous one
+        self.fingerprint = self._fingerprint_artifacts(artifact_paths)
+        self.cache = PredictionCache(self.config.PREDICTION_CACHE_SIZE)
+
+    def predict(self, player_cards: list[list[dict]]) -> list[tuple[str, float]]:
+        """Predict deck types and confidences for many players' cards at once."""
+        keys = [self._create_cache_key(cards) for cards in player_cards]
+        cached_predictions = [self.cache.get(key) for key in keys]
+
+        # Run the model once for the unique card multisets that weren't cached
+        uncached_cards = {
+            key: cards
+            for key, cards, prediction in zip(keys, player_cards, cached_predictions)
+            if prediction is None
+        }
+        new_predictions = dict(
+            zip(uncached_cards, self._predict(list(uncached_cards.values())))
+        )
+
+        for key, prediction in new_predictions.items():
+            self.cache.put(key, prediction)
+
+        return [
+            prediction if prediction is not None else new_predictions[key]
+            for key, prediction in zip(keys, cached_predictions)
+        ]
+
+    def _predict(self, player_cards: list[list[dict]]) -> list[tuple[str, float]]:
+        """Run the deck type model on a batch of players' cards."""
+        if not player_cards:
+            return []
+
+        # One sparse matrix and one in-place booster pass for the whole batch
+        prediction_probability = self.booster.inplace_predict(
+            self._vectorize(player_cards)
+        )
+
+        # The most probable class is the prediction, its probability the confidence
+        predicted_deck_types = self.classes[prediction_probability.argmax(axis=1)]
+        confidences = np.round(prediction_probability.max(axis=1), 4)
+
+        return list(zip(predicted_deck_types.tolist(), confidences.tolist()))
+
+    def _vectorize(self, player_cards: list[list[dict]]) -> csr_matrix:
+        """
+        Build the l2 normalized tf-idf CSR matrix of players' cards.
+
+        Matches the deck model notebook's TfidfVectorizer: card names are
+        lowercased, the term count is the card amount, and unknown cards are
+        dropped.
+        """
+        card_names = [
+            card["card_name"].lower() for cards in player_cards for card in cards
+        ]
+        amounts = [card["card_amount"] for cards in player_cards for card in cards]
+        rows = np.repeat(
+            np.arange(len(player_cards)), [len(cards) for cards in player_cards]
+        )
+
+        # Look up every card of the batch in the vocabulary at once
+        indices = np.searchsorted(self.vocabulary, card_names)
+        indices = np.minimum(indices, len(self.vocabulary) - 1)
+        known = self.vocabulary[indices] == np.asarray(card_names, dtype=str)
+
+        # Repeated cards of a player are summed into one term count
+        matrix = coo_matrix(
+            (
+                np.asarray(amounts, dtype=np.float64)[known],
+                (rows[known], indices[known]),
+            ),
+            shape=(len(player_cards), len(self.vocabulary)),
+        ).tocsr()
+        matrix.data *= self.idf[matrix.indices]
+
+        # Normalize each row to unit length, leaving rows without known cards empty
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        matrix.data /= np.repeat(norms, np.diff(matrix.indptr))
+
+        return matrix
+
+    def _create_cache_key(self, cards: list[dict]) -> str:
+        """Hash the sorted (card_name, card_amount) pairs with the fingerprint."""
+        card_pairs = sorted(
+            (card["card_name"], int(card["card_amount"])) for card in cards
+        )
+        canonical_cards = json.dumps(card_pairs, separators=(",", ":"))
+
+        return hashlib.sha256(
+            f"{self.fingerprint}:{canonical_cards}".encode("utf-8")
+        ).hexdigest()
+
+    @staticmethod
+    def _fingerprint_artifacts(paths: list[str]) -> str:
+        """Hash the contents of the model artifacts."""
+        artifacts_hash = hashlib.sha256()
+
+        for path in paths:
+            with open(path, "rb") as file:
+                artifacts_hash.update(hashlib.file_digest(file, "sha256").digest())
+
+        return artifacts_hash.hexdigest()
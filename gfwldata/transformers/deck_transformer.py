@@ -17,7 +17,7 @@ class DeckTransformer:
             logger.info("deck_id %s failed validation", deck_id)
             return
 
-        published_at = self._clean_published_at(deck_data.get("publishDate"))
+        published_at = self.clean_published_at(deck_data.get("publishDate"))
 
         # Base deck data
         base_deck_data = {
@@ -59,7 +59,7 @@ class DeckTransformer:
         return True
 
     @staticmethod
-    def _clean_published_at(published_at: str) -> datetime | None:
+    def clean_published_at(published_at: str) -> datetime | None:
         """Cleans and converts the published_at string to a datetime object."""
         if not isinstance(published_at, str):
             return
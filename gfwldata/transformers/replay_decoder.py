@@ -0,0 +1,98 @@
+import json
+import logging
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayValidationError(Exception):
+    """Raised when replay data is malformed and can't be parsed."""
+
+    pass
+
+
+if msgspec is not None:
+    # Play fields validate_replay doesn't check decode from any JSON scalar, so
+    # both decoders accept the same replays
+    Scalar = str | int | float | bool | None
+
+    class ReplayLog(msgspec.Struct):
+        """A log entry of a play. Only the fields the parser reads are decoded."""
+
+        username: Scalar = None
+        public_log: Scalar = None
+        private_log: Scalar = None
+
+    class ReplayPlay(msgspec.Struct):
+        """A play, whose log is a single entry, a list of entries, or neither."""
+
+        seconds: Scalar = None
+        play: Scalar = None
+        owner: Scalar = None
+        log: list[ReplayLog | Scalar] | ReplayLog | Scalar = None
+
+    class ReplayPlayer(msgspec.Struct):
+        username: str
+
+    class Replay(msgspec.Struct):
+        """The fields of a duelingbook replay that ReplayParser uses."""
+
+        date: str
+        player1: ReplayPlayer
+        player2: ReplayPlayer
+        plays: list[ReplayPlay]
+
+    _replay_decoder = msgspec.json.Decoder(Replay)
+
+
+def decode_replay(data: bytes) -> dict:
+    """
+    Decode replay JSON bytes into the dict ReplayParser expects.
+
+    With msgspec installed, the bytes are decoded straight into typed structs
+    that skip every field the parser doesn't read. Otherwise it falls back to
+    the json module. Either way, malformed replays raise ReplayValidationError.
+    """
+    if msgspec is None:
+        try:
+            replay_data = json.loads(data)
+        except json.JSONDecodeError as e:
+            raise ReplayValidationError(f"Replay is not valid JSON: {e}") from e
+
+        return validate_replay(replay_data)
+
+    try:
+        replay = _replay_decoder.decode(data)
+    except msgspec.DecodeError as e:
+        raise ReplayValidationError(f"Replay failed validation: {e}") from e
+
+    return msgspec.to_builtins(replay)
+
+
+def validate_replay(replay_data: dict) -> dict:
+    """Validate that replay_data has the keys and types ReplayParser reads."""
+    if not isinstance(replay_data, dict):
+        raise ReplayValidationError("Replay data is not a dict")
+
+    if not isinstance(replay_data.get("date"), str):
+        raise ReplayValidationError("Replay data is missing the date")
+
+    for player in ("player1", "player2"):
+        if not isinstance(replay_data.get(player), dict) or not isinstance(
+            replay_data[player].get("username"), str
+        ):
+            raise ReplayValidationError(f"Replay data is missing {player}'s username")
+
+    plays = replay_data.get("plays")
+
+    if not isinstance(plays, list):
+        raise ReplayValidationError("Replay data does not contain a plays list")
+
+    if not all(isinstance(play, dict) for play in plays):
+        raise ReplayValidationError("Replay data contains plays that aren't dicts")
+
+    return replay_data
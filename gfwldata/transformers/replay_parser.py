@@ -2,32 +2,55 @@ import logging
 import re
 from uuid import UUID
 
-import joblib
+import numpy as np
 import pandas as pd
 
 from gfwldata.config.replay_parser import ReplayParserSettings
+from gfwldata.transformers.deck_classifier import DeckClassifier
+from gfwldata.transformers.replay_decoder import validate_replay
 
 logger = logging.getLogger(__name__)
 
+# Card names are quoted in the play logs, eg. 'Drew "Sangan"'
+CARD_NAME_PATTERN = r'"([^"]*)"'
+
+# Log phrases for cards moving out of, or back into, the deck
+DECK_ADD_PATTERN = re.compile("Drew|from Deck|from top of deck")
+DECK_RETURN_PATTERN = re.compile("to top of deck|to bottom of deck")
+
+# The plays_df columns used to parse a replay
+PLAYS_COLUMNS = ["seconds", "play", "username", "public_log", "private_log"]
+
+# Public logs of the player who lost the game
+DEFEAT_LOGS = ["Admitted defeat", "Lost Duel"]
+
 
 class ReplayParser:
     def __init__(self, config: ReplayParserSettings):
         self.config = config
-        self.label_encoder = joblib.load(self.config.LABEL_ENCODER_PATH)
-        self.vectorizer = joblib.load(self.config.VECTORIZER_PATH)
-        self.model = joblib.load(self.config.MODEL_PATH)
+        self.classifier = DeckClassifier(self.config)
 
-    def parse_replay(self, replay_data: dict, league_match_id: UUID) -> pd.DataFrame:
-        """Parse replay data and return a DataFrame of game results."""
-        if not self._validate_replay_data(replay_data):
-            logger.error("league_match_id %s replay failed to parse", league_match_id)
-            return
+    def parse_replay(
+        self,
+        replay_data: dict,
+        league_match_id: UUID,
+        predict_deck_types: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Parse replay data and return a DataFrame of game results.
+
+        Set predict_deck_types to False to defer deck type predictions, so that
+        predict_deck_types can run them for many replays at once.
+
+        Raises ReplayValidationError if replay_data is malformed.
+        """
+        validate_replay(replay_data)
 
         plays_df = self._create_plays_df(replay_data)
 
         plays_df = plays_df.assign(
-            card_name=lambda df: df.apply(self._extract_card_name, axis=1),
-            deck_change=lambda df: df.apply(self._calculate_deck_change, axis=1),
+            card_name=self._extract_card_names,
+            deck_change=self._calculate_deck_changes,
             game_number=lambda df: df.public_log.str.contains("Chose to go").cumsum(),
         )
 
@@ -37,83 +60,94 @@ class ReplayParser:
 
         games_df = self._create_games_df(played_at, player1, player2, plays_df)
 
+        if predict_deck_types:
+            games_df = self.predict_deck_types(games_df)
+
         logger.info("Replay parse for league_match_id %s is complete", league_match_id)
         return games_df
 
-    def _validate_replay_data(self, replay_data: dict) -> bool:
-        """Validate that replay_data is a dict and contains necessary keys."""
-        if not isinstance(replay_data, dict):
-            logger.warning("replay_data is not a dict")
-            return False
+    def predict_deck_types(self, games_df: pd.DataFrame) -> pd.DataFrame:
+        """Add both players' deck type predictions to games_df in one batch."""
+        if games_df.empty:
+            return games_df
 
-        if "plays" not in replay_data:
-            logger.warning("replay_data does not contain plays key")
-            return False
-
-        return True
+        predictions = self.classifier.predict(
+            games_df["player1_cards"].tolist() + games_df["player2_cards"].tolist()
+        )
+        player1_predictions = predictions[: len(games_df)]
+        player2_predictions = predictions[len(games_df) :]
+
+        return games_df.assign(
+            player1_deck_type=[deck_type for deck_type, _ in player1_predictions],
+            player1_deck_type_confidence=[conf for _, conf in player1_predictions],
+            player2_deck_type=[deck_type for deck_type, _ in player2_predictions],
+            player2_deck_type_confidence=[conf for _, conf in player2_predictions],
+        )
 
     def _create_plays_df(self, replay_data: dict) -> pd.DataFrame:
-        """Create plays_df from replay_data's plays log."""
-        plays = []
+        """Create plays_df from replay_data's plays log, one column at a time."""
+        columns = {column: [] for column in PLAYS_COLUMNS}
 
         for play in replay_data.get("plays"):
-            base = {
-                "seconds": play.get("seconds"),
-                "play": play.get("play"),
-                "owner": play.get("owner"),
-            }
-
             logs = play.get("log")
 
-            if isinstance(logs, list):
-                for log in logs:
-                    plays.append({**base, **log})
-            elif isinstance(logs, dict):
-                plays.append({**base, **logs})
+            if isinstance(logs, dict):
+                logs = [logs]
+            elif not isinstance(logs, list):
+                continue
 
-        return (
-            pd.json_normalize(plays)
-            .assign(username=lambda df: df["owner"].fillna(df["username"]))
-            .drop(columns="owner")
+            seconds = play.get("seconds")
+            play_name = play.get("play")
+            owner = play.get("owner")
+
+            for log in logs:
+                columns["seconds"].append(seconds)
+                columns["play"].append(play_name)
+                # Plays without an owner fall back to the log's username
+                columns["username"].append(
+                    owner if owner is not None else log.get("username")
+                )
+                columns["public_log"].append(log.get("public_log"))
+                columns["private_log"].append(log.get("private_log"))
+
+        return pd.DataFrame(columns)
+
+    def _extract_card_names(self, plays_df: pd.DataFrame) -> pd.Series:
+        """Extract the first quoted card name of each play, preferring private logs."""
+        private_names = (
+            plays_df["private_log"]
+            .astype(str)
+            .str.extract(CARD_NAME_PATTERN, expand=False)
+        )
+        public_names = (
+            plays_df["public_log"]
+            .astype(str)
+            .str.extract(CARD_NAME_PATTERN, expand=False)
         )
 
-    def _extract_card_name(self, row: pd.Series) -> str | None:
-        """Extract card name from logs."""
         # Don't extract cards from messages
-        if row.play == "Duel message":
-            return None
-
-        for log in (row.private_log, row.public_log):
-            if not log:
-                continue
-
-            matches = re.findall(r'"([^"]*)"', str(log))
-            if matches:
-                return matches[0]
-
-        return None
-
-    def _calculate_deck_change(self, row: pd.Series) -> int:
-        """Determine whether cards were added or returned to deck."""
-        logs = [str(row.private_log), str(row.public_log)]
+        return private_names.fillna(public_names).where(
+            plays_df["play"] != "Duel message"
+        )
 
-        # Card added from deck
-        if any(
-            phrase in log
-            for log in logs
-            for phrase in ("Drew", "from Deck", "from top of deck")
-        ):
-            return 1
+    def _calculate_deck_changes(self, plays_df: pd.DataFrame) -> pd.Series:
+        """Determine whether cards were added (1) or returned (-1) to deck."""
+        logs = [
+            plays_df["private_log"].astype(str),
+            plays_df["public_log"].astype(str),
+        ]
 
-        # Card returned to deck
-        if any(
-            phrase in log
-            for log in logs
-            for phrase in ("to top of deck", "to bottom of deck")
-        ):
-            return -1
+        added = np.logical_or.reduce(
+            [log.str.contains(DECK_ADD_PATTERN) for log in logs]
+        )
+        returned = np.logical_or.reduce(
+            [log.str.contains(DECK_RETURN_PATTERN) for log in logs]
+        )
 
-        return 0
+        # Cards added from deck take precedence over cards returned to deck
+        return pd.Series(
+            np.select([added, returned], [1, -1], default=0), index=plays_df.index
+        )
 
     def _create_games_df(
         self,
@@ -122,44 +156,34 @@ class ReplayParser:
         player2: str,
         plays_df: pd.DataFrame,
     ) -> pd.DataFrame:
-        """Create games_df incorporating plays and deck type predictions."""
+        """Create games_df from plays, without deck type predictions."""
         games_data = []
         games_base = {"played_at": played_at, "player1": player1, "player2": player2}
 
-        # Get match cards df
+        # Get match cards, split by game and player in a single groupby pass
         cards_df = self._create_cards_df(plays_df)
+        player_cards = {
+            key: group[["card_name", "card_amount"]]
+            for key, group in cards_df.groupby(["game_number", "username"])
+        }
+        no_cards_df = cards_df[["card_name", "card_amount"]].iloc[0:0]
 
-        for game in range(1, max(plays_df["game_number"]) + 1):
-            # Filter plays_df by game_number
-            game_df = plays_df.query("game_number == @game")
+        # Get winners and who went first for every game at once
+        game_results = self._get_game_results(player1, player2, plays_df)
 
+        for game in range(1, max(plays_df["game_number"]) + 1):
             # Get player cards data
-            player1_cards_df = cards_df.query(
-                "game_number == @game & username == @player1"
-            )[["card_name", "card_amount"]]
-
-            player2_cards_df = cards_df.query(
-                "game_number == @game & username == @player2"
-            )[["card_name", "card_amount"]]
-
-            # Deck type model results
-            player1_prediction = self._predict_deck_type(player1_cards_df)
-            player2_prediction = self._predict_deck_type(player2_cards_df)
+            player1_cards_df = player_cards.get((game, player1), no_cards_df)
+            player2_cards_df = player_cards.get((game, player2), no_cards_df)
 
             games_data.append(
                 {
                     **games_base,
                     "game_number": game,
-                    "game_winner": self._get_game_winner(player1, player2, game_df),
-                    "went_first": game_df.query("public_log == 'Chose to go first'")[
-                        "username"
-                    ].item(),
+                    "game_winner": game_results["game_winner"].get(game),
+                    "went_first": game_results["went_first"].get(game),
                     "player1_cards": player1_cards_df.to_dict("records"),
                     "player2_cards": player2_cards_df.to_dict("records"),
-                    "player1_deck_type": player1_prediction[0],
-                    "player1_deck_type_confidence": player1_prediction[1],
-                    "player2_deck_type": player2_prediction[0],
-                    "player2_deck_type_confidence": player2_prediction[1],
                 }
             )
 
@@ -180,36 +204,29 @@ class ReplayParser:
             .query("card_amount > 0")
         )
 
-    def _get_game_winner(
-        self, player1: str, player2: str, game_df: pd.DataFrame
-    ) -> str | None:
-        """Determine the game winner based on defeat logs."""
-        # Get game loser if one exists
-        game_loser = game_df.query("public_log in ['Admitted defeat', 'Lost Duel']")[
-            "username"
-        ]
-
-        # If there's no game loser, then there's a draw
-        if game_loser.empty:
-            return None
+    def _get_game_results(
+        self, player1: str, player2: str, plays_df: pd.DataFrame
+    ) -> dict[str, dict[int, str]]:
+        """Determine every game's winner and who went first from the plays logs."""
+        public_log = plays_df["public_log"]
 
-        # Continue with returning game winner if no draw
-        return player1 if game_loser.item() == player2 else player2
-
-    def _predict_deck_type(self, player_cards_df: pd.DataFrame) -> tuple[str, float]:
-        """Predict deck type for a player's cards using the deck type model."""
-        # Repeat card_name by card_amount, then turn to list, then concat by "|" separator
-        cards_str = "|".join(
-            player_cards_df["card_name"].repeat(player_cards_df["card_amount"]).tolist()
+        went_first = (
+            plays_df.loc[public_log == "Chose to go first"]
+            .groupby("game_number")["username"]
+            .first()
         )
 
-        # Model prediction
-        vectorized_data = self.vectorizer.transform([cards_str])
-        prediction = self.model.predict(vectorized_data)
-        predicted_deck_type = self.label_encoder.inverse_transform(prediction)[0]
-
-        # Get max prediction probability as confidence
-        prediction_probability = self.model.predict_proba(vectorized_data)
-        confidence = max(prediction_probability[0])
+        # Games without a defeat log are draws and have no winner
+        game_loser = (
+            plays_df.loc[public_log.isin(DEFEAT_LOGS)]
+            .groupby("game_number")["username"]
+            .first()
+        )
+        game_winner = game_loser.map(
+            lambda loser: player1 if loser == player2 else player2
+        )
 
-        return predicted_deck_type, round(confidence, 4)
+        return {
+            "game_winner": game_winner.to_dict(),
+            "went_first": went_first.to_dict(),
+        }
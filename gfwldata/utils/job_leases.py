@@ -0,0 +1,127 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import Engine, and_, or_, select, update
+
+from gfwldata.utils.models import Job, JobState
+
+logger = logging.getLogger(__name__)
+
+
+class JobLeaser:
+    """Claims jobs for one worker under leases that expire unless renewed."""
+
+    def __init__(
+        self,
+        engine: Engine,
+        pending_state: JobState,
+        in_progress_state: JobState,
+        lease_seconds: float,
+        owner: str | None = None,
+    ):
+        self.engine = engine
+        self.pending_state = pending_state
+        self.in_progress_state = in_progress_state
+        self.lease_seconds = lease_seconds
+        self.owner = (
+            owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        )
+
+        self._stop_heartbeat = threading.Event()
+        self._heartbeat_thread: threading.Thread | None = None
+
+    def __enter__(self) -> "JobLeaser":
+        # Held leases are renewed in the background until exit releases the jobs
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self._heartbeat_thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop_heartbeat.set()
+        self._heartbeat_thread.join()
+        self.release()
+
+    def claim(self, n: int) -> list[UUID]:
+        """Claims up to n jobs in s3_key order, returning their league_match_ids."""
+        now = utcnow()
+
+        # Jobs whose lease expired, e.g. because their worker died, are claimable again
+        claimable = or_(
+            Job.state == self.pending_state,
+            and_(
+                Job.state == self.in_progress_state,
+                or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now),
+            ),
+        )
+
+        # Other workers skip the rows locked here, where the database supports it
+        claimable_ids = (
+            select(Job.id)
+            .filter(claimable)
+            .order_by(Job.s3_key, Job.id)
+            .limit(n)
+            .with_for_update(skip_locked=True)
+        )
+
+        # The outer filter is checked again on each row, so a job is claimed once
+        statement = (
+            update(Job.__table__)
+            .where(Job.id.in_(claimable_ids.scalar_subquery()), claimable)
+            .values(
+                state=self.in_progress_state,
+                lease_owner=self.owner,
+                lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+            )
+            .returning(Job.league_match_id)
+        )
+
+        with self.engine.begin() as connection:
+            league_match_ids = connection.execute(statement).scalars().all()
+
+        logger.info("Worker %s claimed %s jobs", self.owner, len(league_match_ids))
+        return league_match_ids
+
+    def renew(self) -> int:
+        """Extends the lease of every job this worker holds, returning their count."""
+        statement = (
+            update(Job.__table__)
+            .where(Job.lease_owner == self.owner, Job.state == self.in_progress_state)
+            .values(lease_expires_at=utcnow() + timedelta(seconds=self.lease_seconds))
+        )
+
+        with self.engine.begin() as connection:
+            return connection.execute(statement).rowcount
+
+    def release(self) -> int:
+        """Returns every job this worker still holds to pending, for other workers."""
+        statement = (
+            update(Job.__table__)
+            .where(Job.lease_owner == self.owner, Job.state == self.in_progress_state)
+            .values(state=self.pending_state, lease_owner=None, lease_expires_at=None)
+        )
+
+        with self.engine.begin() as connection:
+            released = connection.execute(statement).rowcount
+
+        if released:
+            logger.info("Worker %s released %s unfinished jobs", self.owner, released)
+
+        return released
+
+    def _heartbeat(self) -> None:
+        while not self._stop_heartbeat.wait(self.lease_seconds / 3):
+            try:
+                renewed = self.renew()
+                logger.debug("Worker %s renewed %s leases", self.owner, renewed)
+            except Exception:
+                logger.exception("Worker %s failed to renew its leases", self.owner)
+
+
+def utcnow() -> datetime:
+    """The current UTC datetime, naive like the values of DateTime columns."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
@@ -83,6 +83,14 @@ class Job(BaseModel):
         String,
         comment="The filename, or key, of job in aws s3. Doesn't include any folder (prefix) names.",
     )
+    lease_owner = Column(
+        String,
+        comment="The worker holding the job while it's in progress.",
+    )
+    lease_expires_at = Column(
+        DateTime,
+        comment="UTC datetime after which another worker may reclaim the in progress job.",
+    )
 
     # Relationships
     league_matches = relationship("LeagueMatch", back_populates="jobs")
@@ -0,0 +1,38 @@
+import logging
+import time
+from datetime import timedelta
+
+
+class ProgressTracker:
+    """Logs completed work as it arrives, with live throughput and ETA figures."""
+
+    def __init__(self, total: int, logger: logging.Logger, unit: str = "jobs"):
+        self.total = total
+        self.logger = logger
+        self.unit = unit
+        self.completed = 0
+        self.failed = 0
+        self.started_at = time.perf_counter()
+
+    def update(self, completed: int, failed: int = 0) -> None:
+        """Record a finished batch of work and log the overall progress."""
+        self.completed += completed
+        self.failed += failed
+
+        done = self.completed + self.failed
+        elapsed = time.perf_counter() - self.started_at
+        throughput = done / elapsed if elapsed else 0.0
+        remaining = max(self.total - done, 0)
+        eta = timedelta(seconds=round(remaining / throughput)) if throughput else None
+
+        self.logger.info(
+            "Progress: %s/%s %s (%.1f%%), %s failed, %.2f %s/sec, ETA %s",
+            done,
+            self.total,
+            self.unit,
+            100 * done / self.total if self.total else 100.0,
+            self.failed,
+            throughput,
+            self.unit,
+            eta if eta is not None else "unknown",
+        )
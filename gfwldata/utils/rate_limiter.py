@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveLimiter:
+    """AIMD limiter of concurrent requests and requests per second."""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_rate: float,
+        latency_target: float,
+        is_congestion: Callable[[Exception], bool],
+        initial_concurrency: int | None = None,
+        initial_rate: float | None = None,
+        min_concurrency: int = 1,
+        min_rate: float = 0.1,
+        decrease_factor: float = 0.5,
+        report_interval: float = 30.0,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_rate = max_rate
+        self.min_concurrency = min_concurrency
+        self.min_rate = min_rate
+        self.latency_target = latency_target
+        self.is_congestion = is_congestion
+        self.decrease_factor = decrease_factor
+        self.report_interval = report_interval
+
+        self.concurrency = float(initial_concurrency or max_concurrency)
+        self.rate = float(initial_rate or max_rate)
+
+        self.in_flight = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.congestion_signals = 0
+
+        self._condition = asyncio.Condition()
+        self._next_start = 0.0
+        self._last_decrease = float("-inf")
+        self._report_started = time.monotonic()
+        self._report_succeeded = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Wait for room under both limits, then time the request in the block."""
+        await self._acquire()
+        started = time.monotonic()
+        error = None
+
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            await self._release(time.monotonic() - started, error)
+
+    def snapshot(self) -> dict[str, int | float | str]:
+        """The current limits and counters, and the throughput since the last report."""
+        elapsed = time.monotonic() - self._report_started
+        succeeded = self.succeeded - self._report_succeeded
+
+        return {
+            "name": self.name,
+            "concurrency": int(self.concurrency),
+            "rate": round(self.rate, 2),
+            "in_flight": self.in_flight,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "congestion_signals": self.congestion_signals,
+            "throughput": round(succeeded / elapsed, 2) if elapsed else 0.0,
+        }
+
+    async def _acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: self.in_flight < int(self.concurrency)
+            )
+            self.in_flight += 1
+
+            # Space request starts out to the current rate
+            now = time.monotonic()
+            start_at = max(now, self._next_start)
+            self._next_start = start_at + 1 / self.rate
+
+        try:
+            await asyncio.sleep(start_at - now)
+        except BaseException:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+            raise
+
+    async def _release(self, latency: float, error: BaseException | None) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+
+            # Slow requests and congestion errors, e.g. timeouts, 429s or browser
+            # errors, cut the limits, other errors leave them as they are
+            if error is None:
+                self.succeeded += 1
+                if latency <= self.latency_target:
+                    self._increase()
+                else:
+                    self._decrease(f"latency of {latency:.1f}s")
+
+            elif isinstance(error, Exception):
+                self.failed += 1
+                if self.is_congestion(error):
+                    self._decrease(type(error).__name__)
+
+            self._condition.notify_all()
+
+        self._maybe_report()
+
+    def _increase(self) -> None:
+        """Additively raise the limits that are holding requests back."""
+        # By about one per round of requests
+        if self.in_flight + 1 >= int(self.concurrency):
+            self.concurrency = min(
+                self.max_concurrency, self.concurrency + 1 / self.concurrency
+            )
+
+        if self._next_start > time.monotonic():
+            self.rate = min(self.max_rate, self.rate + 1 / self.rate)
+
+    def _decrease(self, reason: str) -> None:
+        """Multiplicatively cut both limits, once per congestion episode."""
+        self.congestion_signals += 1
+        now = time.monotonic()
+
+        # One burst of failures within latency_target only counts once
+        if now - self._last_decrease < self.latency_target:
+            return
+
+        self._last_decrease = now
+        self.concurrency = max(
+            self.min_concurrency, self.concurrency * self.decrease_factor
+        )
+        self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+
+        logger.warning(
+            "Limiter %s backed off after %s: %s concurrent, %.2f/sec",
+            self.name,
+            reason,
+            int(self.concurrency),
+            self.rate,
+        )
+
+    def _maybe_report(self) -> None:
+        if time.monotonic() - self._report_started < self.report_interval:
+            return
+
+        logger.info("Limiter %s: %s", self.name, self.snapshot())
+
+        self._report_started = time.monotonic()
+        self._report_succeeded = self.succeeded
@@ -0,0 +1,200 @@
+import json
+import logging
+import mmap
+import shutil
+import time
+import uuid
+import zlib
+from pathlib import Path
+from typing import NamedTuple
+
+from gfwldata.utils.s3 import AsyncS3Client, S3Client
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILENAME = "index.json"
+
+
+class ArchiveEntry(NamedTuple):
+    """Where an archived replay is, relative to the archive's root."""
+
+    segment: str
+    offset: int
+    length: int
+
+
+class ReplayArchiveWriter:
+    """Packs a season's replays into large segment files with a sidecar index."""
+
+    def __init__(self, archive_dir: str | Path, season: int, max_segment_bytes: int):
+        self.archive_dir = Path(archive_dir)
+        self.season_dir = self.archive_dir / f"season_{season}"
+        self.max_segment_bytes = max_segment_bytes
+
+        # Segment names are unique per run, so readers holding a previous index
+        # never see a segment change, see scripts.compact_replay_archive
+        self.run_id = f"{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+        self.entries: dict[int, ArchiveEntry] = {}
+        self.segment_paths: list[Path] = []
+        self._segment_file = None
+        self._segment_name = None
+
+        # Replace the previous archive of the season
+        shutil.rmtree(self.season_dir, ignore_errors=True)
+        self.season_dir.mkdir(parents=True)
+
+    def __enter__(self) -> "ReplayArchiveWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add(self, replay_id: int, body: bytes) -> None:
+        """Append a replay's body to the current segment."""
+        if replay_id in self.entries:
+            return
+
+        if (
+            self._segment_file is None
+            or self._segment_file.tell() >= self.max_segment_bytes
+        ):
+            self._start_segment()
+
+        # Each replay is compressed on its own, to be read back with one ranged read
+        record = zlib.compress(body)
+        self.entries[replay_id] = ArchiveEntry(
+            self._segment_name, self._segment_file.tell(), len(record)
+        )
+        self._segment_file.write(record)
+
+    def close(self) -> None:
+        """Close the last segment and write the season's index."""
+        if self._segment_file is not None:
+            self._segment_file.close()
+            self._segment_file = None
+
+        index_path = self.season_dir / INDEX_FILENAME
+        index_path.write_text(
+            json.dumps(
+                {str(replay_id): entry for replay_id, entry in self.entries.items()}
+            )
+        )
+        logger.info(
+            "Archived %s replays into %s segments in %s",
+            len(self.entries),
+            len(self.segment_paths),
+            self.season_dir,
+        )
+
+    def _start_segment(self) -> None:
+        if self._segment_file is not None:
+            self._segment_file.close()
+
+        segment_path = (
+            self.season_dir / f"segment_{self.run_id}_{len(self.segment_paths):04d}.zz"
+        )
+        self.segment_paths.append(segment_path)
+        self._segment_name = segment_path.relative_to(self.archive_dir).as_posix()
+        self._segment_file = segment_path.open("wb")
+
+
+class ReplayArchiveIndex:
+    """Maps replay_id to its archived (segment, offset, length), across seasons."""
+
+    def __init__(self, entries: dict[int, ArchiveEntry] | None = None):
+        self.entries = entries or {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, replay_id: int) -> ArchiveEntry | None:
+        return self.entries.get(replay_id)
+
+    def add_season_index(self, data: str | bytes) -> None:
+        """Merge the contents of a season's index.json into the index."""
+        for replay_id, entry in json.loads(data).items():
+            self.entries.setdefault(int(replay_id), ArchiveEntry(*entry))
+
+    @classmethod
+    def from_dir(cls, archive_dir: str | Path) -> "ReplayArchiveIndex":
+        """Load the index of every season archived in a local directory."""
+        index = cls()
+
+        for index_path in sorted(Path(archive_dir).glob(f"season_*/{INDEX_FILENAME}")):
+            index.add_season_index(index_path.read_bytes())
+
+        return index
+
+    @classmethod
+    def from_s3(cls, s3_client: S3Client, prefix: str) -> "ReplayArchiveIndex":
+        """Load the index of every season archived under prefix in s3."""
+        index = cls()
+
+        for key in s3_client.list_objects(prefix):
+            if key.endswith(f"/{INDEX_FILENAME}"):
+                # Indexes are rewritten by each compaction, so skip the local cache
+                data = s3_client.get_object_bytes(key, use_cache=False)
+
+                if data is not None:
+                    index.add_season_index(data)
+
+        return index
+
+
+class LocalReplayArchive:
+    """Reads archived replays from memory-mapped local segment files."""
+
+    def __init__(self, archive_dir: str | Path, index: ReplayArchiveIndex):
+        self.archive_dir = Path(archive_dir)
+        self.index = index
+        self._segments: dict[str, mmap.mmap | None] = {}
+
+    def get(self, replay_id: int) -> bytes | None:
+        """Get an archived replay's body, or None when it isn't archived locally."""
+        entry = self.index.get(replay_id)
+        if entry is None:
+            return None
+
+        segment = self._open_segment(entry.segment)
+        if segment is None:
+            return None
+
+        return decompress_record(segment[entry.offset : entry.offset + entry.length])
+
+    def close(self) -> None:
+        for segment in self._segments.values():
+            if segment is not None:
+                segment.close()
+
+        self._segments.clear()
+
+    def _open_segment(self, segment_name: str) -> mmap.mmap | None:
+        """Memory-map a segment once, remembering segments that aren't local."""
+        if segment_name not in self._segments:
+            segment_path = self.archive_dir / segment_name
+
+            if segment_path.exists():
+                with segment_path.open("rb") as file:
+                    self._segments[segment_name] = mmap.mmap(
+                        file.fileno(), 0, access=mmap.ACCESS_READ
+                    )
+            else:
+                self._segments[segment_name] = None
+
+        return self._segments[segment_name]
+
+
+async def get_archived_replay(
+    s3_session: AsyncS3Client, prefix: str, entry: ArchiveEntry
+) -> bytes | None:
+    """Asynchronously get an archived replay's body with a ranged read."""
+    record = await s3_session.get_object_range(
+        f"{prefix}{entry.segment}", entry.offset, entry.length
+    )
+    return decompress_record(record) if record is not None else None
+
+
+def decompress_record(record: bytes) -> bytes:
+    """Decompress a replay's record, as sliced out of its segment."""
+    return zlib.decompress(record)
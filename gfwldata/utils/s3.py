@@ -1,7 +1,11 @@
+import asyncio
+import gzip
 import io
+import itertools
 import json
 import logging
 from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
 from typing import Any, Callable, Literal
 
 import aioboto3
@@ -10,26 +14,54 @@ import pandas as pd
 import polars as pl
 
 from gfwldata.config.settings import Settings
+from gfwldata.utils.s3_cache import S3ObjectCache
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 logger = logging.getLogger(__name__)
 
+# A filetype's suffix names the compression of its body, e.g. json.gz
+Filetype = Literal["json", "json.gz", "json.zst", "csv", "csv.gz", "csv.zst"]
+
+# Content-Encoding of each compression suffix, and the magic bytes its bodies start with
+CONTENT_ENCODINGS = {"gz": "gzip", "zst": "zstd"}
+MAGIC_NUMBERS = {"gzip": b"\x1f\x8b", "zstd": b"\x28\xb5\x2f\xfd"}
+
 
 class BaseSerializer:
     """Serializes data for s3 put functionality"""
 
     def serialize_data(
-        self, obj: Any, filetype: Literal["json", "csv"]
-    ) -> tuple[bytes, str] | None:
-        """Serialize data based on filetype using the dispatch table."""
+        self, obj: Any, filetype: Filetype
+    ) -> tuple[bytes, str, str | None]:
+        """
+        Serialize data based on filetype using the dispatch table.
+
+        Returns the body, its content type, and its content encoding when the
+        filetype has a compression suffix.
+        """
         serializers: dict[str, Callable] = {
             "json": self._serialize_json,
             "csv": self._serialize_csv,
         }
 
-        if filetype not in serializers:
+        base_filetype, _, suffix = filetype.partition(".")
+
+        if base_filetype not in serializers or (
+            suffix and suffix not in CONTENT_ENCODINGS
+        ):
             raise ValueError(f"Unsupported filetype: {filetype}")
 
-        return serializers[filetype](obj)
+        body, content_type = serializers[base_filetype](obj)
+
+        if not suffix:
+            return body, content_type, None
+
+        content_encoding = CONTENT_ENCODINGS[suffix]
+        return compress_body(body, content_encoding), content_type, content_encoding
 
     @staticmethod
     def _serialize_json(obj: dict | list) -> tuple[bytes, str]:
@@ -68,33 +100,69 @@ class S3Client(BaseSerializer):
             aws_secret_access_key=self.config.AWS_SECRET_ACCESS_KEY,
             region_name=self.config.AWS_REGION,
         )
+        self.cache = create_s3_cache(self.config)
 
     def get_object(self, key: str) -> str | None:
         """Retrieve an object from the S3 bucket by key"""
+        body = self.get_object_bytes(key)
+
+        if body is None:
+            return None
+
+        return body.decode("utf-8")
+
+    def get_object_bytes(self, key: str, use_cache: bool = True) -> bytes | None:
+        """Retrieve an object's decompressed bytes from the local cache or S3 by key"""
+        cache = self.cache if use_cache else None
+
         try:
+            if cache is not None and self._is_cache_valid(key):
+                body = cache.get(self.bucket_name, key)
+
+                if body is not None:
+                    logger.info("Retrieved cached object with key: %s", key)
+                    return decompress_body(body)
+
             response = self.client.get_object(Bucket=self.bucket_name, Key=key)
-            body_str = response["Body"].read().decode("utf-8")
+            body = response["Body"].read()
+
+            # The cache keeps bodies as stored, so they still match their ETag
+            if cache is not None:
+                cache.put(self.bucket_name, key, response["ETag"], body)
 
             logger.info("Retrieved object with key: %s", key)
-            return body_str
+            return decompress_body(body, response.get("ContentEncoding"))
 
         except Exception:
             logger.exception("Failed to retrieve object with key: %s", key)
             return None
 
+    def head_object(self, key: str) -> dict[str, Any] | None:
+        """Retrieve an object's metadata, e.g. its ContentEncoding, without its body"""
+        try:
+            return self.client.head_object(Bucket=self.bucket_name, Key=key)
+
+        except Exception:
+            logger.exception("Failed to retrieve metadata of object with key: %s", key)
+            return None
+
     def put_object(
-        self, key: str, obj: Any, filetype: Literal["json", "csv"]
+        self, key: str, obj: Any, filetype: Filetype
     ) -> dict[str, Any] | None:
         """Upload an object to S3 with the specified filetype."""
         try:
-            body, content_type = self.serialize_data(obj, filetype)
+            body, content_type, content_encoding = self.serialize_data(obj, filetype)
 
             response = self.client.put_object(
                 Bucket=self.bucket_name,
                 Key=key,
                 Body=body,
                 ContentType=content_type,
+                **({"ContentEncoding": content_encoding} if content_encoding else {}),
             )
+            if self.cache is not None:
+                self.cache.delete(self.bucket_name, key)
+
             logger.info("Successfully uploaded object with key: %s", key)
             return response
 
@@ -102,6 +170,55 @@ class S3Client(BaseSerializer):
             logger.exception("Failed to upload object with key: %s", key)
             return None
 
+    def upload_file(self, path: str | Path, key: str) -> bool:
+        """Upload a local file to S3, in parts if it's large."""
+        try:
+            self.client.upload_file(str(path), self.bucket_name, key)
+
+            if self.cache is not None:
+                self.cache.delete(self.bucket_name, key)
+
+            logger.info("Successfully uploaded file %s with key: %s", path, key)
+            return True
+
+        except Exception:
+            logger.exception("Failed to upload file %s with key: %s", path, key)
+            return False
+
+    def delete_objects(self, keys: list[str]) -> bool:
+        """Delete objects from S3 by key, up to 1000 keys per request."""
+        try:
+            for batch in itertools.batched(keys, 1000):
+                response = self.client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                )
+                if response.get("Errors"):
+                    raise RuntimeError(response["Errors"])
+
+                if self.cache is not None:
+                    for key in batch:
+                        self.cache.delete(self.bucket_name, key)
+
+            logger.info("Successfully deleted %d objects", len(keys))
+            return True
+
+        except Exception:
+            logger.exception("Failed to delete objects with keys: %s", keys)
+            return False
+
+    def _is_cache_valid(self, key: str) -> bool:
+        """Check the cached ETag of key against s3, if revalidation is enabled."""
+        if not self.config.S3_CACHE_REVALIDATE:
+            return True
+
+        cached_etag = self.cache.get_etag(self.bucket_name, key)
+        if cached_etag is None:
+            return False
+
+        response = self.client.head_object(Bucket=self.bucket_name, Key=key)
+        return response["ETag"].strip('"') == cached_etag
+
     def list_objects(self, prefix: str) -> list[str]:
         """List file keys inside the given prefix (folder/) in the S3 bucket."""
         keys = []
@@ -137,24 +254,81 @@ def get_s3_client(config: Settings, bucket_name: str):
 
 
 class AsyncS3Client(BaseSerializer):
-    """Asynchronous AWS S3 client for uploading objects."""
-
-    def __init__(self, bucket_name: str, s3_client: aioboto3.Session):
+    """Asynchronous AWS S3 client for uploading and downloading objects."""
+
+    def __init__(
+        self,
+        bucket_name: str,
+        s3_client: aioboto3.Session,
+        cache: S3ObjectCache | None = None,
+        revalidate_cache: bool = False,
+    ):
         self.bucket_name = bucket_name
         self.client = s3_client
+        self.cache = cache
+        self.revalidate_cache = revalidate_cache
+
+    async def get_object_bytes(self, key: str) -> bytes | None:
+        """Asynchronously retrieve an object's decompressed bytes from cache or S3"""
+        try:
+            if self.cache is not None and await self._is_cache_valid(key):
+                body = await asyncio.to_thread(self.cache.get, self.bucket_name, key)
+
+                if body is not None:
+                    logger.info("Retrieved cached object with key: %s", key)
+                    return decompress_body(body)
+
+            response = await self.client.get_object(Bucket=self.bucket_name, Key=key)
+
+            async with response["Body"] as stream:
+                body = await stream.read()
+
+            if self.cache is not None:
+                await asyncio.to_thread(
+                    self.cache.put, self.bucket_name, key, response["ETag"], body
+                )
+
+            logger.info("Retrieved object with key: %s", key)
+            return decompress_body(body, response.get("ContentEncoding"))
+
+        except Exception:
+            logger.exception("Failed to retrieve object with key: %s", key)
+            return None
+
+    async def get_object_range(
+        self, key: str, offset: int, length: int
+    ) -> bytes | None:
+        """Asynchronously retrieve length bytes of an object, starting at offset"""
+        try:
+            response = await self.client.get_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                Range=f"bytes={offset}-{offset + length - 1}",
+            )
+
+            async with response["Body"] as stream:
+                return await stream.read()
+
+        except Exception:
+            logger.exception("Failed to retrieve range of object with key: %s", key)
+            return None
 
     async def put_object(
-        self, key: str, obj: Any, filetype: Literal["json", "csv"]
+        self, key: str, obj: Any, filetype: Filetype
     ) -> dict[str, Any] | None:
         """Asynchronously upload an object to S3 with the specified filetype."""
         try:
-            body, content_type = self.serialize_data(obj, filetype)
+            body, content_type, content_encoding = self.serialize_data(obj, filetype)
             response = await self.client.put_object(
                 Bucket=self.bucket_name,
                 Key=key,
                 Body=body,
                 ContentType=content_type,
+                **({"ContentEncoding": content_encoding} if content_encoding else {}),
             )
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.delete, self.bucket_name, key)
+
             logger.info("Successfully uploaded object with key: %s", key)
             return response
 
@@ -162,6 +336,71 @@ class AsyncS3Client(BaseSerializer):
             logger.exception("Failed to upload object with key: %s", key)
             return None
 
+    async def _is_cache_valid(self, key: str) -> bool:
+        """Check the cached ETag of key against s3, if revalidation is enabled."""
+        if not self.revalidate_cache:
+            return True
+
+        cached_etag = await asyncio.to_thread(
+            self.cache.get_etag, self.bucket_name, key
+        )
+        if cached_etag is None:
+            return False
+
+        response = await self.client.head_object(Bucket=self.bucket_name, Key=key)
+        return response["ETag"].strip('"') == cached_etag
+
+
+def compress_body(body: bytes, content_encoding: str) -> bytes:
+    """Compress a body with a gzip or zstd content encoding."""
+    if content_encoding == "gzip":
+        # mtime=0 keeps the output, and so the ETag, the same for the same body
+        return gzip.compress(body, mtime=0)
+
+    if content_encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression needs the 'zstd' extra installed")
+        return zstandard.ZstdCompressor().compress(body)
+
+    raise ValueError(f"Unsupported content encoding: {content_encoding}")
+
+
+def decompress_body(body: bytes, content_encoding: str | None = None) -> bytes:
+    """
+    Decompress a gzip or zstd body, returning any other body as is.
+
+    Without a content encoding, e.g. for bodies read back from the local
+    cache, the encoding is detected from the body's magic bytes.
+    """
+    if not content_encoding:
+        content_encoding = next(
+            (
+                encoding
+                for encoding, magic_number in MAGIC_NUMBERS.items()
+                if body.startswith(magic_number)
+            ),
+            None,
+        )
+
+    if content_encoding == "gzip":
+        return gzip.decompress(body)
+
+    if content_encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd decompression needs the 'zstd' extra installed")
+        # Streamed, since frames written by other tools may not record their size
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+
+    return body
+
+
+def create_s3_cache(config: Settings) -> S3ObjectCache | None:
+    """Create the local s3 object cache, unless it's disabled in config."""
+    if not config.S3_CACHE_ENABLED:
+        return None
+
+    return S3ObjectCache(config.S3_CACHE_DIR, config.S3_CACHE_MAX_BYTES)
+
 
 @asynccontextmanager
 async def get_async_s3_session(config: Settings, bucket_name: str):
@@ -171,4 +410,9 @@ async def get_async_s3_session(config: Settings, bucket_name: str):
         region_name=config.AWS_REGION,
     )
     async with session.client("s3") as s3_session:
-        yield AsyncS3Client(bucket_name, s3_session)
+        yield AsyncS3Client(
+            bucket_name,
+            s3_session,
+            cache=create_s3_cache(config),
+            revalidate_cache=config.S3_CACHE_REVALIDATE,
+        )
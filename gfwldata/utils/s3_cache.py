@@ -0,0 +1,138 @@
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class S3ObjectCache:
+    """Content-addressed local cache of s3 object bodies."""
+
+    def __init__(self, cache_dir: str | Path, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.blobs_dir = self.cache_dir / "blobs"
+        self.max_bytes = max_bytes
+
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+
+        # One connection shared by threads, e.g. the async client's to_thread calls
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            self.cache_dir / "index.db", timeout=30, check_same_thread=False
+        )
+        with self._lock, self._connection:
+            self._connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS blobs (
+                    etag TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS entries (
+                    bucket TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    etag TEXT NOT NULL,
+                    PRIMARY KEY (bucket, key)
+                );
+                CREATE INDEX IF NOT EXISTS ix_blobs_last_access ON blobs (last_access);
+                CREATE INDEX IF NOT EXISTS ix_entries_etag ON entries (etag);
+                """
+            )
+
+    def get_etag(self, bucket: str, key: str) -> str | None:
+        """Get the ETag cached for an object, without reading its body."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT etag FROM entries WHERE bucket = ? AND key = ?", (bucket, key)
+            ).fetchone()
+
+        return row[0] if row else None
+
+    def get(self, bucket: str, key: str) -> bytes | None:
+        """Get a cached object's body, or None when it isn't cached or is corrupt."""
+        etag = self.get_etag(bucket, key)
+
+        if etag is None:
+            return None
+
+        try:
+            body = zlib.decompress(self._blob_path(etag).read_bytes())
+        except (OSError, zlib.error):
+            logger.warning("Dropping unreadable cached object with key: %s", key)
+            self.delete(bucket, key)
+            return None
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "UPDATE blobs SET last_access = ? WHERE etag = ?", (time.time(), etag)
+            )
+
+        return body
+
+    def put(self, bucket: str, key: str, etag: str, body: bytes) -> None:
+        """Cache an object's body under its ETag, then evict down to max_bytes."""
+        # ETags are opaque keys, multipart and SSE-KMS or SSE-C ETags aren't md5s
+        etag = etag.strip('"')
+        blob_path = self._blob_path(etag)
+
+        # Identical bodies under other keys share the blob
+        if not blob_path.exists():
+            temp_path = blob_path.with_suffix(f".{threading.get_ident()}.tmp")
+            temp_path.write_bytes(zlib.compress(body))
+            temp_path.replace(blob_path)
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO blobs (etag, size, last_access) VALUES (?, ?, ?)",
+                (etag, blob_path.stat().st_size, time.time()),
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries (bucket, key, etag) VALUES (?, ?, ?)",
+                (bucket, key, etag),
+            )
+
+        self._evict()
+
+    def delete(self, bucket: str, key: str) -> None:
+        """Forget an object, e.g. after it's overwritten in s3."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM entries WHERE bucket = ? AND key = ?", (bucket, key)
+            )
+
+    def _evict(self) -> None:
+        """Delete the least recently used blobs until the cache fits max_bytes."""
+        with self._lock, self._connection:
+            total_bytes = self._connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()[0]
+
+            if total_bytes <= self.max_bytes:
+                return
+
+            evicted = []
+            for etag, size in self._connection.execute(
+                "SELECT etag, size FROM blobs ORDER BY last_access"
+            ):
+                if total_bytes <= self.max_bytes:
+                    break
+                evicted.append(etag)
+                total_bytes -= size
+
+            self._connection.executemany(
+                "DELETE FROM blobs WHERE etag = ?", [(etag,) for etag in evicted]
+            )
+            self._connection.executemany(
+                "DELETE FROM entries WHERE etag = ?", [(etag,) for etag in evicted]
+            )
+
+        for etag in evicted:
+            self._blob_path(etag).unlink(missing_ok=True)
+
+        logger.info("Evicted %s objects from the s3 cache", len(evicted))
+
+    def _blob_path(self, etag: str) -> Path:
+        return self.blobs_dir / f"{etag}.zz"
@@ -0,0 +1,170 @@
+import argparse
+import itertools
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sqlalchemy.future import select
+
+from gfwldata.config.replay_parser import ReplayParserSettings, replay_parser_settings
+from gfwldata.config.settings import settings
+from gfwldata.utils.db import get_db_session
+from gfwldata.utils.logger import setup_logger
+from gfwldata.utils.models import Job, JobState, LeagueMatch
+from gfwldata.utils.replay_archive import INDEX_FILENAME, ReplayArchiveWriter
+from gfwldata.utils.s3 import S3Client
+
+setup_logger(Path("gfwldata/logs/compact_replay_archive.log"))
+logger = logging.getLogger("scripts.compact_replay_archive")
+
+BUCKET_NAME = "gfwl"
+
+# Jobs whose replays have been uploaded to s3
+ARCHIVABLE_STATES = (
+    JobState.S3_COMPLETED,
+    JobState.PARSER_PENDING,
+    JobState.PARSER_IN_PROGRESS,
+    JobState.PARSER_COMPLETED,
+    JobState.PARSER_FAILED,
+)
+
+DOWNLOAD_THREADS = 32
+
+
+def run_pipeline(
+    config: ReplayParserSettings, seasons: list[int] | None, upload: bool
+) -> None:
+    """Pack each season's replays into segments, and upload them with their index."""
+    s3_client = S3Client(settings, BUCKET_NAME)
+    replays_by_season = get_archivable_replays(seasons)
+
+    for season, replays in replays_by_season.items():
+        logger.info("Compacting %s replays of season %s", len(replays), season)
+        writer = compact_season(s3_client, config, season, replays)
+
+        if upload:
+            upload_season(s3_client, config, writer)
+
+
+def get_archivable_replays(
+    seasons: list[int] | None,
+) -> dict[int, list[tuple[int, str]]]:
+    """Get the (replay_id, s3_key) of every uploaded replay, by season."""
+    statement = (
+        select(LeagueMatch.season, LeagueMatch.replay_id, Job.s3_key)
+        .join(Job, Job.league_match_id == LeagueMatch.id)
+        .filter(Job.state.in_(ARCHIVABLE_STATES), LeagueMatch.replay_id.is_not(None))
+        .distinct()
+        .order_by(LeagueMatch.season, LeagueMatch.replay_id)
+    )
+
+    if seasons:
+        statement = statement.filter(LeagueMatch.season.in_(seasons))
+
+    replays_by_season = defaultdict(list)
+
+    with get_db_session() as db_session:
+        for season, replay_id, s3_key in db_session.execute(statement):
+            replays_by_season[season].append((replay_id, s3_key))
+
+    return replays_by_season
+
+
+def compact_season(
+    s3_client: S3Client,
+    config: ReplayParserSettings,
+    season: int,
+    replays: list[tuple[int, str]],
+) -> ReplayArchiveWriter:
+    """Download a season's replays and pack them into local segments."""
+    with (
+        ReplayArchiveWriter(
+            config.ARCHIVE_DIR, season, config.ARCHIVE_SEGMENT_BYTES
+        ) as writer,
+        ThreadPoolExecutor(DOWNLOAD_THREADS) as executor,
+    ):
+        # Download in batches, so only one batch of replays is held in memory
+        for batch in itertools.batched(replays, DOWNLOAD_THREADS * 8):
+            bodies = executor.map(
+                lambda replay: s3_client.get_object_bytes(f"replays/{replay[1]}"),
+                batch,
+            )
+
+            for (replay_id, s3_key), body in zip(batch, bodies):
+                if body is None:
+                    logger.warning("Skipping replay missing from s3: %s", s3_key)
+                    continue
+
+                writer.add(replay_id, body)
+
+    return writer
+
+
+def upload_season(
+    s3_client: S3Client, config: ReplayParserSettings, writer: ReplayArchiveWriter
+) -> None:
+    """
+    Upload a season's segments, then its index, so the index never dangles.
+
+    Segments of earlier runs are deleted once the new index is up. Readers
+    still holding an earlier index fall back to the replay's own s3 key.
+    """
+    segment_keys = set()
+
+    for segment_path in writer.segment_paths:
+        segment_key = segment_path.relative_to(config.ARCHIVE_DIR).as_posix()
+        segment_keys.add(f"{config.ARCHIVE_S3_PREFIX}{segment_key}")
+
+        if not s3_client.upload_file(
+            segment_path, f"{config.ARCHIVE_S3_PREFIX}{segment_key}"
+        ):
+            logger.error("Not uploading the index of %s", writer.season_dir)
+            return
+
+    season_prefix = (
+        f"{config.ARCHIVE_S3_PREFIX}"
+        f"{writer.season_dir.relative_to(config.ARCHIVE_DIR).as_posix()}/"
+    )
+    index_key = f"{season_prefix}{INDEX_FILENAME}"
+
+    if not s3_client.upload_file(writer.season_dir / INDEX_FILENAME, index_key):
+        logger.error("Keeping the previous segments of %s", writer.season_dir)
+        return
+
+    orphaned_keys = [
+        key
+        for key in s3_client.list_objects(season_prefix)
+        if key != index_key and key not in segment_keys
+    ]
+    if orphaned_keys:
+        logger.info(
+            "Deleting %s segments of earlier runs in %s",
+            len(orphaned_keys),
+            season_prefix,
+        )
+        s3_client.delete_objects(orphaned_keys)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Pack replays into compressed segment files per season."
+    )
+    parser.add_argument(
+        "--season",
+        type=int,
+        action="append",
+        dest="seasons",
+        help="Season to compact, can be repeated. Defaults to every season.",
+    )
+    parser.add_argument(
+        "--no-upload",
+        action="store_true",
+        help="Only write the segments and indexes locally.",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_pipeline(replay_parser_settings, args.seasons, upload=not args.no_upload)
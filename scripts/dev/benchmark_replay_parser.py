@@ -0,0 +1,74 @@
+import argparse
+import logging
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+from gfwldata.config.replay_parser import replay_parser_settings
+from gfwldata.transformers.replay_parser import ReplayParser
+from gfwldata.utils.logger import setup_logger
+from scripts.dev.generate_synthetic_replays import generate_replays
+
+logger = logging.getLogger("scripts.dev.benchmark_replay_parser")
+
+
+def run_benchmark(
+    replays: list[dict], parser: ReplayParser, predict_deck_types: bool
+) -> float:
+    """Parse every replay and return the elapsed seconds."""
+    start = time.perf_counter()
+
+    for replay in replays:
+        parser.parse_replay(replay, uuid.uuid4(), predict_deck_types)
+
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark ReplayParser.parse_replay on synthetic replays."
+    )
+    parser.add_argument("--replays", type=int, default=200)
+    parser.add_argument("--games", type=int, default=3)
+    parser.add_argument("--plays-per-game", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-predict",
+        action="store_true",
+        help="Skip deck type predictions, to benchmark parsing alone",
+    )
+    args = parser.parse_args()
+
+    # Parser logs every replay, which would dominate the timings
+    logging.getLogger("gfwldata.transformers.replay_parser").setLevel(logging.WARNING)
+
+    replays = list(
+        generate_replays(args.replays, args.games, args.plays_per_game, args.seed)
+    )
+    total_plays = sum(len(replay["plays"]) for replay in replays)
+    replay_parser = ReplayParser(replay_parser_settings)
+    predict_deck_types = not args.no_predict
+
+    # Warm up imports and caches before timing
+    run_benchmark(replays[:1], replay_parser, predict_deck_types)
+
+    elapsed = run_benchmark(replays, replay_parser, predict_deck_types)
+
+    # Measure memory in a separate run, since tracemalloc slows parsing down
+    tracemalloc.start()
+    run_benchmark(replays, replay_parser, predict_deck_types)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    logger.info(
+        "Parsed %s replays (%s plays) in %.2fs", len(replays), total_plays, elapsed
+    )
+    logger.info("Replays/sec: %.1f", len(replays) / elapsed)
+    logger.info("Plays/sec: %.0f", total_plays / elapsed)
+    logger.info("Peak traced memory: %.1f MiB", peak_memory / 2**20)
+
+
+if __name__ == "__main__":
+    setup_logger(Path("gfwldata/logs/benchmark_replay_parser.log"))
+    main()
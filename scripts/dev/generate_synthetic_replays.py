@@ -0,0 +1,182 @@
+import argparse
+import json
+import logging
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator
+
+from gfwldata.utils.logger import setup_logger
+
+logger = logging.getLogger("scripts.dev.generate_synthetic_replays")
+
+# A goat format card pool, so generated card names look like real replays
+CARD_POOL = [
+    "Airknight Parshath",
+    "Black Luster Soldier - Envoy of the Beginning",
+    "Book of Moon",
+    "Breaker the Magical Warrior",
+    "Call of the Haunted",
+    "Chaos Sorcerer",
+    "D.D. Warrior Lady",
+    "Delinquent Duo",
+    "Exiled Force",
+    "Graceful Charity",
+    "Heavy Storm",
+    "Jinzo",
+    "Magician of Faith",
+    "Metamorphosis",
+    "Mirror Force",
+    "Mystical Space Typhoon",
+    "Nobleman of Crossout",
+    "Premature Burial",
+    "Reinforcement of the Army",
+    "Sakuretsu Armor",
+    "Sangan",
+    "Scapegoat",
+    "Snatch Steal",
+    "Thousand-Eyes Restrict",
+    "Tribe-Infecting Virus",
+    "Tsukuyomi",
+    "Zaborg the Thunder Monarch",
+]
+
+# (play, public_log, private_log) templates, where {card} is a quoted card name
+PLAY_TEMPLATES = [
+    ("Draw card", "Drew card", 'Drew "{card}"'),
+    ("Draw card", "Drew card", 'Drew "{card}"'),
+    ("Normal Summon", 'Normal Summoned "{card}"', None),
+    ("Set monster", "Set monster", 'Set "{card}"'),
+    ("Set ST", "Set card in Spell & Trap Zone", 'Set "{card}"'),
+    ("Activate ST", 'Activated "{card}"', None),
+    ("Send to GY", 'Sent "{card}" to Graveyard', None),
+    ("Banish", 'Banished "{card}"', None),
+    ("To hand", 'Added "{card}" from Deck to hand', None),
+    ("To hand", 'Added "{card}" from Graveyard to hand', None),
+    ("To T Deck", 'Moved "{card}" to top of deck', None),
+    ("To B Deck", 'Moved "{card}" to bottom of deck', None),
+    ("Mill", 'Sent "{card}" from top of deck to Graveyard', None),
+    ("Attack", 'Attacked with "{card}"', None),
+    ("Shuffle deck", "Shuffled deck", None),
+    ("Duel message", 'Chain "{card}"?', None),
+]
+
+
+def generate_replay(
+    rng: random.Random, replay_id: int, games: int, plays_per_game: int
+) -> dict:
+    """Generate a duelingbook-like replay of a match between two players."""
+    player1 = f"player{replay_id}a"
+    player2 = f"player{replay_id}b"
+    decks = {player: rng.sample(CARD_POOL, 15) for player in (player1, player2)}
+
+    plays = []
+    seconds = 0
+
+    for _ in range(games):
+        # Every game starts with a player choosing to go first
+        chooser = rng.choice((player1, player2))
+        plays.append(
+            {
+                "seconds": seconds,
+                "play": "Duel message",
+                "owner": None,
+                "log": {"username": chooser, "public_log": "Chose to go first"},
+            }
+        )
+
+        for _ in range(plays_per_game):
+            seconds += rng.randint(1, 20)
+            plays.append(_generate_play(rng, seconds, decks, player1, player2))
+
+        # Some games end in a draw, without a defeat log
+        if rng.random() < 0.98:
+            loser = rng.choice((player1, player2))
+            plays.append(
+                {
+                    "seconds": seconds,
+                    "play": "Duel message",
+                    "owner": loser,
+                    "log": {
+                        "username": loser,
+                        "public_log": rng.choice(("Admitted defeat", "Lost Duel")),
+                    },
+                }
+            )
+
+    played_at = datetime(2024, 1, 1) + timedelta(minutes=rng.randint(0, 525_600))
+
+    return {
+        "id": replay_id,
+        "date": played_at.strftime("%Y-%m-%d %H:%M:%S"),
+        "conceal": False,
+        "player1": {"username": player1},
+        "player2": {"username": player2},
+        "plays": plays,
+    }
+
+
+def generate_replays(
+    count: int, games: int, plays_per_game: int, seed: int = 0
+) -> Iterator[dict]:
+    """Generate a reproducible corpus of replays."""
+    rng = random.Random(seed)
+
+    for replay_id in range(1, count + 1):
+        yield generate_replay(rng, replay_id, games, plays_per_game)
+
+
+def _generate_play(
+    rng: random.Random,
+    seconds: int,
+    decks: dict[str, list[str]],
+    player1: str,
+    player2: str,
+) -> dict:
+    """Generate a single play, with one log or a list of logs."""
+    username = rng.choice((player1, player2))
+    play, public_log, private_log = rng.choice(PLAY_TEMPLATES)
+    card = rng.choice(decks[username])
+
+    log = {"username": username, "public_log": public_log.format(card=card)}
+
+    if private_log:
+        log["private_log"] = private_log.format(card=card)
+
+    # Plays without an owner fall back to the log's username
+    owner = username if rng.random() < 0.8 else None
+
+    # Some plays log several events, like a shuffle after searching the deck
+    if play == "To hand" and "from Deck" in log["public_log"]:
+        logs = [log, {"username": username, "public_log": "Shuffled deck"}]
+        return {"seconds": seconds, "play": play, "owner": owner, "log": logs}
+
+    return {"seconds": seconds, "play": play, "owner": owner, "log": log}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic duelingbook replays as JSON files."
+    )
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument("--replays", type=int, default=100)
+    parser.add_argument("--games", type=int, default=3)
+    parser.add_argument("--plays-per-game", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+
+    for replay in generate_replays(
+        args.replays, args.games, args.plays_per_game, args.seed
+    ):
+        # Same naming as the replay s3 keys
+        replay_path = args.output_dir / f"{replay['id']}_replay.json"
+        replay_path.write_text(json.dumps(replay), encoding="utf-8")
+
+    logger.info("Generated %s replays in %s", args.replays, args.output_dir)
+
+
+if __name__ == "__main__":
+    setup_logger(Path("gfwldata/logs/generate_synthetic_replays.log"))
+    main()
@@ -0,0 +1,37 @@
+import logging
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from gfwldata.config.replay_parser import ReplayParserSettings, replay_parser_settings
+from gfwldata.utils.logger import setup_logger
+
+setup_logger(Path("gfwldata/logs/export_deck_classifier.log"))
+logger = logging.getLogger("scripts.export_deck_classifier")
+
+
+def export_deck_classifier(config: ReplayParserSettings) -> None:
+    """Convert the joblib deck classifier artifacts into load-fast formats."""
+    logger.info("Loading joblib deck classifier artifacts")
+    label_encoder = joblib.load(config.LABEL_ENCODER_PATH)
+    vectorizer = joblib.load(config.VECTORIZER_PATH)
+    model = joblib.load(config.MODEL_PATH)
+
+    # Plain unicode arrays, not object arrays, so they can be memory-mapped
+    np.save(config.CLASSES_PATH, np.asarray(label_encoder.classes_, dtype=str))
+    logger.info("Saved label encoder classes to %s", config.CLASSES_PATH)
+
+    vocabulary = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    np.save(config.VOCABULARY_PATH, np.asarray(vocabulary, dtype=str))
+    logger.info("Saved tf-idf vocabulary to %s", config.VOCABULARY_PATH)
+
+    np.save(config.IDF_PATH, np.asarray(vectorizer.idf_, dtype=np.float64))
+    logger.info("Saved tf-idf idf weights to %s", config.IDF_PATH)
+
+    model.save_model(config.BOOSTER_PATH)
+    logger.info("Saved xgboost booster to %s", config.BOOSTER_PATH)
+
+
+if __name__ == "__main__":
+    export_deck_classifier(replay_parser_settings)
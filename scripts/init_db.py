@@ -1,6 +1,8 @@
 import logging
 from pathlib import Path
 
+from sqlalchemy import inspect, text
+
 from gfwldata.utils.db import sync_engine
 from gfwldata.utils.logger import setup_logger
 from gfwldata.utils.models import Base
@@ -14,6 +16,7 @@ def init_db():
 
     try:
         Base.metadata.create_all(sync_engine)
+        add_missing_columns()
         logger.info("Successfully created all tables!")
 
     except Exception:
@@ -21,5 +24,23 @@ def init_db():
         raise
 
 
+def add_missing_columns():
+    """Add columns that are new since a table was created, e.g. the job leases."""
+    inspector = inspect(sync_engine)
+
+    with sync_engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+
+                column_type = column.type.compile(dialect=sync_engine.dialect)
+                statement = f"ALTER TABLE {table.name} ADD COLUMN {column.name}"
+                connection.execute(text(f"{statement} {column_type}"))
+                logger.info("Added column %s.%s", table.name, column.name)
+
+
 if __name__ == "__main__":
     init_db()
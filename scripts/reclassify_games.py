@@ -0,0 +1,59 @@
+import logging
+from pathlib import Path
+
+from sqlalchemy import update
+from sqlalchemy.future import select
+
+from gfwldata.config.replay_parser import replay_parser_settings
+from gfwldata.transformers.deck_classifier import DeckClassifier
+from gfwldata.utils.db import chunks, get_db_session
+from gfwldata.utils.logger import setup_logger
+from gfwldata.utils.models import Game
+
+setup_logger(Path("gfwldata/logs/reclassify_games.log"))
+logger = logging.getLogger("scripts.reclassify_games")
+
+
+def run_pipeline(batch_size: int = 10_000) -> None:
+    """Re-predict every game's deck types, eg. after the deck model is retrained."""
+    classifier = DeckClassifier(replay_parser_settings)
+
+    with get_db_session() as db_session:
+        games = db_session.execute(
+            select(Game.id, Game.player1_cards, Game.player2_cards)
+        ).all()
+
+        logger.info("Found %s games to reclassify.", len(games))
+
+        for games_batch in chunks(games, batch_size):
+            predictions = classifier.predict(
+                [game.player1_cards for game in games_batch]
+                + [game.player2_cards for game in games_batch]
+            )
+            player1_predictions = predictions[: len(games_batch)]
+            player2_predictions = predictions[len(games_batch) :]
+
+            # Bulk update by primary key
+            db_session.execute(
+                update(Game),
+                [
+                    {
+                        "id": game.id,
+                        "player1_deck_type": player1_prediction[0],
+                        "player1_deck_type_confidence": player1_prediction[1],
+                        "player2_deck_type": player2_prediction[0],
+                        "player2_deck_type_confidence": player2_prediction[1],
+                    }
+                    for game, player1_prediction, player2_prediction in zip(
+                        games_batch, player1_predictions, player2_predictions
+                    )
+                ],
+            )
+
+            logger.info("Reclassified %s games.", len(games_batch))
+
+        logger.info("Deck type prediction cache: %s", classifier.cache.info())
+
+
+if __name__ == "__main__":
+    run_pipeline()
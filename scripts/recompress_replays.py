@@ -0,0 +1,86 @@
+import argparse
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from gfwldata.config.replay import replay_settings
+from gfwldata.config.settings import settings
+from gfwldata.utils.logger import setup_logger
+from gfwldata.utils.s3 import CONTENT_ENCODINGS, S3Client
+
+setup_logger(Path("gfwldata/logs/recompress_replays.log"))
+logger = logging.getLogger("scripts.recompress_replays")
+
+BUCKET_NAME = "gfwl"
+
+UPLOAD_THREADS = 32
+
+
+def run_pipeline(filetype: str) -> None:
+    """Rewrite every replay in s3 that isn't stored with filetype's encoding yet."""
+    s3_client = S3Client(settings, BUCKET_NAME)
+    prefix = replay_settings.S3_PREFIX
+    keys = [key for key in s3_client.list_objects(prefix) if key != prefix]
+
+    logger.info("Recompressing %s replays as %s", len(keys), filetype)
+
+    with ThreadPoolExecutor(UPLOAD_THREADS) as executor:
+        results = list(
+            executor.map(lambda key: recompress_replay(s3_client, key, filetype), keys)
+        )
+
+    logger.info(
+        "Recompressed %s replays, %s were already %s, %s failed",
+        results.count("recompressed"),
+        results.count("skipped"),
+        filetype,
+        results.count("failed"),
+    )
+
+
+def recompress_replay(s3_client: S3Client, key: str, filetype: str) -> str:
+    """Download a replay, which is decompressed on read, and upload it as filetype."""
+    _, _, suffix = filetype.partition(".")
+    content_encoding = CONTENT_ENCODINGS.get(suffix)
+
+    metadata = s3_client.head_object(key)
+    if metadata is None:
+        return "failed"
+
+    if metadata.get("ContentEncoding") == content_encoding:
+        return "skipped"
+
+    # Skip the local cache, so the cache isn't filled with every replay
+    body = s3_client.get_object_bytes(key, use_cache=False)
+    if body is None:
+        return "failed"
+
+    try:
+        replay = json.loads(body)
+    except ValueError:
+        logger.exception("Skipping replay that isn't valid JSON, key: %s", key)
+        return "failed"
+
+    if s3_client.put_object(key, replay, filetype) is None:
+        return "failed"
+
+    return "recompressed"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Rewrite the replays in s3 with a compressed filetype."
+    )
+    parser.add_argument(
+        "--filetype",
+        choices=["json", "json.gz", "json.zst"],
+        default=replay_settings.S3_FILETYPE,
+        help="Filetype to rewrite replays as. Defaults to the scraper's S3_FILETYPE.",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    run_pipeline(args.filetype)
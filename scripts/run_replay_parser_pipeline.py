@@ -1,25 +1,48 @@
-import json
+import asyncio
+import itertools
 import logging
 import multiprocessing as mp
+import queue
+import threading
 from pathlib import Path
+from typing import Iterator
 from uuid import UUID
 
 import pandas as pd
+from sqlalchemy import func, update
 from sqlalchemy.future import select
 from sqlalchemy.orm import Session
 
 from gfwldata.config.replay_parser import replay_parser_settings
 from gfwldata.config.settings import settings
+from gfwldata.loaders.game_loader import GameLoader
+from gfwldata.transformers.replay_decoder import ReplayValidationError, decode_replay
 from gfwldata.transformers.replay_parser import ReplayParser
-from gfwldata.utils.db import get_db_session
+from gfwldata.utils.db import get_db_session, sync_engine
+from gfwldata.utils.job_leases import JobLeaser
 from gfwldata.utils.logger import init_worker_logger, setup_multiproc_logger
-from gfwldata.utils.models import Game, Job, JobState
-from gfwldata.utils.s3 import S3Client
+from gfwldata.utils.models import Job, JobState, LeagueMatch
+from gfwldata.utils.progress import ProgressTracker
+from gfwldata.utils.replay_archive import (
+    LocalReplayArchive,
+    ReplayArchiveIndex,
+    get_archived_replay,
+)
+from gfwldata.utils.s3 import AsyncS3Client, S3Client, get_async_s3_session
 
 logger = logging.getLogger("scripts.run_replay_parser_pipeline")
 
+BUCKET_NAME = "gfwl"
+
+# Jobs in progress are claimed again once their lease expires, so count as pending
+PARSER_PENDING_STATES = (JobState.PARSER_PENDING, JobState.PARSER_IN_PROGRESS)
+
 
 def run_pipeline() -> None:
+    # Workers wait for full chunks, which must fit in the prefetch window
+    if replay_parser_settings.S3_PREFETCH_WINDOW < replay_parser_settings.MP_CHUNK_SIZE:
+        raise ValueError("S3_PREFETCH_WINDOW must be at least MP_CHUNK_SIZE")
+
     # Setup multiprocess logger
     log_queue, listener = setup_multiproc_logger(
         log_file=Path("gfwldata/logs/run_replay_parser_pipeline.log"),
@@ -27,109 +50,311 @@ def run_pipeline() -> None:
     )
     listener.start()
 
-    # Get pending jobs
+    # Queue newly scraped replays and count pending jobs, so progress has an ETA
     with get_db_session() as db_session:
-        pending_jobs = get_pending_jobs(db_session)
+        queue_parser_jobs(db_session)
+        total_jobs = count_pending_jobs(db_session)
+
+    leaser = JobLeaser(
+        sync_engine,
+        JobState.PARSER_PENDING,
+        JobState.PARSER_IN_PROGRESS,
+        replay_parser_settings.LEASE_SECONDS,
+    )
+    progress = ProgressTracker(total_jobs, logger)
+    loader = GameLoader(
+        sync_engine, replay_parser_settings.DB_WRITE_BATCH_SIZE, leaser.owner
+    )
+
+    # Replays packed by scripts.compact_replay_archive are read from their segments
+    replay_archive = LocalReplayArchive(
+        replay_parser_settings.ARCHIVE_DIR,
+        ReplayArchiveIndex.from_dir(replay_parser_settings.ARCHIVE_DIR),
+    )
+    archive_index = ReplayArchiveIndex.from_s3(
+        S3Client(settings, BUCKET_NAME), replay_parser_settings.ARCHIVE_S3_PREFIX
+    )
+    logger.info(
+        "Found %s replays archived locally and %s archived in s3.",
+        len(replay_archive.index),
+        len(archive_index),
+    )
 
-    # Process jobs
-    with mp.Pool(
-        processes=replay_parser_settings.MP_PROCESSES,
-        initializer=worker_initializer,
-        initargs=(log_queue,),
-    ) as pool:
-        pool.map(process_job, pending_jobs)
+    # Prefetch replays in a background event loop, while workers parse earlier ones
+    prefetch_window = threading.BoundedSemaphore(
+        replay_parser_settings.S3_PREFETCH_WINDOW
+    )
+    replay_queue = queue.Queue()
+    prefetch_thread = threading.Thread(
+        target=asyncio.run,
+        args=(
+            prefetch_replays(
+                stream_pending_jobs(leaser, replay_parser_settings.DB_PAGE_SIZE),
+                replay_queue,
+                prefetch_window,
+                replay_archive,
+                archive_index,
+            ),
+        ),
+        daemon=True,
+    )
 
+    # Handle results as soon as any chunk of prefetched replays is parsed
+    replay_chunks = itertools.batched(
+        iter_prefetched_replays(replay_queue), replay_parser_settings.MP_CHUNK_SIZE
+    )
 
-def get_pending_jobs(db_session: Session) -> list[tuple[UUID, str]]:
+    try:
+        with (
+            mp.Pool(
+                processes=replay_parser_settings.MP_PROCESSES,
+                initializer=worker_initializer,
+                initargs=(log_queue,),
+            ) as pool,
+            leaser,
+        ):
+            # Started once the heartbeat runs, since the prefetch claims jobs
+            prefetch_thread.start()
+
+            # Workers only parse; this process is the single database writer
+            for game_rows, completed_ids, failed_ids in pool.imap_unordered(
+                process_jobs,
+                replay_chunks,
+                chunksize=replay_parser_settings.MP_IMAP_CHUNKSIZE,
+            ):
+                loader.add(game_rows, completed_ids, failed_ids)
+                progress.update(len(completed_ids), len(failed_ids))
+
+                # Parsed replays free up room in the prefetch window
+                for _ in range(len(completed_ids) + len(failed_ids)):
+                    prefetch_window.release()
+
+            # Written before the leaser releases the jobs it still holds
+            loader.flush()
+
+    finally:
+        replay_archive.close()
+        listener.stop()
+
+
+def queue_parser_jobs(db_session: Session) -> None:
+    """Move jobs whose replays are in s3 into the parser's pending state."""
     statement = (
-        select(Job.league_match_id, Job.s3_key)
-        .filter(Job.state == JobState.S3_COMPLETED)
-        .order_by(Job.s3_key)
+        update(Job)
+        .where(Job.state == JobState.S3_COMPLETED)
+        .values(state=JobState.PARSER_PENDING)
     )
     result = db_session.execute(statement)
-    pending_jobs = result.all()
+    db_session.commit()
+
+    logger.info("Queued %s new jobs for the parser.", result.rowcount)
 
-    logger.info("Found %s pending s3_keys to process.", len(pending_jobs))
-    return pending_jobs
+
+def count_pending_jobs(db_session: Session) -> int:
+    statement = select(func.count()).filter(Job.state.in_(PARSER_PENDING_STATES))
+    pending_jobs_count = db_session.execute(statement).scalar_one()
+
+    logger.info("Found %s pending s3_keys to process.", pending_jobs_count)
+    return pending_jobs_count
+
+
+def stream_pending_jobs(
+    leaser: JobLeaser, page_size: int
+) -> Iterator[tuple[UUID, str, int]]:
+    """Yield pending jobs page by page, each page claimed under the worker's lease."""
+    # Claimed jobs are in progress, so pages never repeat and other workers skip them
+    while league_match_ids := leaser.claim(page_size):
+        statement = (
+            select(Job.league_match_id, Job.s3_key, LeagueMatch.replay_id)
+            .join(LeagueMatch, Job.league_match_id == LeagueMatch.id)
+            .filter(Job.league_match_id.in_(league_match_ids))
+            .order_by(Job.s3_key, Job.league_match_id)
+        )
+
+        with get_db_session() as db_session:
+            page = db_session.execute(statement).all()
+
+        yield from page
+
+
+async def prefetch_replays(
+    jobs: Iterator[tuple[UUID, str, int]],
+    replay_queue: queue.Queue,
+    prefetch_window: threading.BoundedSemaphore,
+    replay_archive: LocalReplayArchive,
+    archive_index: ReplayArchiveIndex,
+) -> None:
+    """Download replays concurrently and put their raw bytes on replay_queue."""
+    try:
+        async with (
+            get_async_s3_session(settings, BUCKET_NAME) as s3_session,
+            asyncio.TaskGroup() as task_group,
+        ):
+            # Reading the next page of jobs from the database blocks
+            while (job := await asyncio.to_thread(next, jobs, None)) is not None:
+                # A slot is held until the job's parsed result is back, bounding
+                # both in-flight downloads and replays waiting in memory
+                await asyncio.to_thread(prefetch_window.acquire)
+                task_group.create_task(
+                    fetch_replay(
+                        s3_session, job, replay_queue, replay_archive, archive_index
+                    )
+                )
+
+    except Exception:
+        logger.exception("Error prefetching replays from s3")
+
+    finally:
+        # Tells iter_prefetched_replays every job is downloaded
+        replay_queue.put(None)
+
+
+async def fetch_replay(
+    s3_session: AsyncS3Client,
+    job: tuple[UUID, str, int],
+    replay_queue: queue.Queue,
+    replay_archive: LocalReplayArchive,
+    archive_index: ReplayArchiveIndex,
+) -> None:
+    league_match_id, s3_key, replay_id = job
+    replay_bytes = None
+
+    # Archived replays are read from local segments, then with ranged reads of
+    # segments in s3, and other replays from their own object
+    try:
+        replay_bytes = replay_archive.get(replay_id)
+
+        if replay_bytes is None and (entry := archive_index.get(replay_id)):
+            replay_bytes = await get_archived_replay(
+                s3_session, replay_parser_settings.ARCHIVE_S3_PREFIX, entry
+            )
+
+    except Exception:
+        logger.exception("Error reading archived replay_id: %s", replay_id)
+
+    if replay_bytes is None:
+        replay_bytes = await s3_session.get_object_bytes(f"replays/{s3_key}")
+
+    replay_queue.put((league_match_id, s3_key, replay_bytes))
+
+
+def iter_prefetched_replays(
+    replay_queue: queue.Queue,
+) -> Iterator[tuple[UUID, str, bytes | None]]:
+    """Yield prefetched replays until prefetch_replays is done."""
+    while (replay := replay_queue.get()) is not None:
+        yield replay
 
 
 def worker_initializer(log_queue: mp.Queue) -> None:
-    global global_s3_client, global_parser
+    global global_parser
 
     init_worker_logger(log_queue)
 
-    global_s3_client = S3Client(settings, "gfwl")
     global_parser = ReplayParser(replay_parser_settings)
 
     logger.info(
-        "Initialized logger, s3_client, and parser in process: %s",
+        "Initialized logger and parser in process: %s",
         mp.current_process().name,
     )
 
 
-def process_job(job: tuple[UUID, str]) -> None:
-    global global_s3_client, global_parser
+def process_jobs(
+    replays: tuple[tuple[UUID, str, bytes | None], ...],
+) -> tuple[list[dict], list[UUID], list[UUID]]:
+    """
+    Parse a chunk of prefetched replays into game rows for the parent to load.
 
-    league_match_id, s3_key = job
+    Returns the game rows, and the completed and failed league_match_ids.
+    """
+    global global_parser
 
-    try:
-        with get_db_session() as db_session:
+    games_dfs = []
+    completed_ids = []
+    failed_ids = []
+
+    # Parse each replay on its own, so a bad replay doesn't fail the whole chunk
+    for league_match_id, s3_key, replay_bytes in replays:
+        try:
             logger.info("Processing league_match_id: %s", league_match_id)
 
-            replay_data = extract_replay_from_s3(global_s3_client, s3_key)
+            if not replay_bytes:
+                raise ValueError(f"No data for {s3_key} found in s3")
 
-            games_df = global_parser.parse_replay(replay_data, league_match_id)
+            replay_data = decode_replay(replay_bytes)
 
-            load_tables_to_database(db_session, league_match_id, games_df)
+            games_df = global_parser.parse_replay(
+                replay_data, league_match_id, predict_deck_types=False
+            )
 
-            logger.info("Finished processing league_match_id: %s", league_match_id)
-
-    except Exception:
-        logger.exception(
-            "Error processing league_match_id: %s, s3_key: %s", league_match_id, s3_key
-        )
+            if not games_df.empty:
+                games_dfs.append(games_df.assign(league_match_id=league_match_id))
 
+            completed_ids.append(league_match_id)
 
-def extract_replay_from_s3(s3_client: S3Client, s3_key: str) -> dict:
-    replay_string = s3_client.get_object(f"replays/{s3_key}")
+        except ReplayValidationError as e:
+            failed_ids.append(league_match_id)
+            logger.error(
+                "league_match_id %s replay failed validation: %s", league_match_id, e
+            )
 
-    if not replay_string:
-        raise ValueError("No data for %s found in s3", s3_key)
+        except Exception:
+            failed_ids.append(league_match_id)
+            logger.exception(
+                "Error processing league_match_id: %s, s3_key: %s",
+                league_match_id,
+                s3_key,
+            )
 
-    return json.loads(replay_string)
+    if not games_dfs:
+        return [], completed_ids, failed_ids
 
+    try:
+        # Deck type predictions for every game in the chunk at once
+        chunk_games_df = global_parser.predict_deck_types(
+            pd.concat(games_dfs, ignore_index=True)
+        )
+        game_rows = create_game_rows(chunk_games_df)
 
-def load_tables_to_database(
-    db_session: Session,
-    league_match_id: UUID,
-    games_df: pd.DataFrame,
-) -> None:
-    # Sqlite doesn't handle pd.NA, change to None
-    games_df = games_df.replace({pd.NA: None})
+        logger.info(
+            "Deck type prediction cache in process %s: %s",
+            mp.current_process().name,
+            global_parser.classifier.cache.info(),
+        )
 
-    # Create Game object
-    for row in games_df.itertuples():
-        game = Game(
-            league_match_id=league_match_id,
-            played_at=row.played_at,
-            player1=row.player1,
-            player2=row.player2,
-            player1_deck_type=row.player1_deck_type,
-            player1_deck_type_confidence=round(row.player1_deck_type_confidence, 4),
-            player2_deck_type=row.player2_deck_type,
-            player2_deck_type_confidence=round(row.player2_deck_type_confidence, 4),
-            player1_cards=row.player1_cards,
-            player2_cards=row.player2_cards,
-            game_number=row.game_number,
-            game_winner=row.game_winner,
-            went_first=row.went_first,
+    except Exception:
+        logger.exception(
+            "Error predicting deck types for chunk of league_match_ids: %s",
+            [league_match_id for league_match_id, _, _ in replays],
         )
+        return [], [], [league_match_id for league_match_id, _, _ in replays]
 
-        # Add object to sqlalchemy session
-        db_session.add(game)
+    return game_rows, completed_ids, failed_ids
 
-    # Commit changes to database
-    db_session.commit()
+
+def create_game_rows(games_df: pd.DataFrame) -> list[dict]:
+    """Create games table rows from the parsed games of many league matches."""
+    # Sqlite doesn't handle pd.NA, change to None
+    games_df = games_df.replace({pd.NA: None})
+
+    return [
+        {
+            "league_match_id": row.league_match_id,
+            "played_at": row.played_at,
+            "player1": row.player1,
+            "player2": row.player2,
+            "player1_deck_type": row.player1_deck_type,
+            "player1_deck_type_confidence": round(row.player1_deck_type_confidence, 4),
+            "player2_deck_type": row.player2_deck_type,
+            "player2_deck_type_confidence": round(row.player2_deck_type_confidence, 4),
+            "player1_cards": row.player1_cards,
+            "player2_cards": row.player2_cards,
+            "game_number": row.game_number,
+            "game_winner": row.game_winner,
+            "went_first": row.went_first,
+        }
+        for row in games_df.itertuples()
+    ]
 
 
 if __name__ == "__main__":
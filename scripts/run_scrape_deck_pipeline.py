@@ -1,11 +1,14 @@
+import argparse
 import asyncio
-import functools
+import itertools
 import logging
+import math
+from datetime import datetime
 from pathlib import Path
 
-import aiometer
 import httpx
 import pandas as pd
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from tenacity import (
     RetryError,
@@ -23,49 +26,220 @@ from gfwldata.transformers.deck_transformer import DeckTransformer
 from gfwldata.utils.db import get_async_db_session
 from gfwldata.utils.logger import setup_logger
 from gfwldata.utils.models import EventDeck
+from gfwldata.utils.rate_limiter import AdaptiveLimiter
 
 setup_logger(Path("gfwldata/logs/run_scrape_deck_pipeline.log"))
 logger = logging.getLogger("scripts.run_scrape_deck_pipeline")
 
+# Page fetches and deck fetches retry alike
+http_retry = retry(
+    stop=stop_after_attempt(deck_settings.MAX_RETRIES),
+    wait=wait_exponential(
+        multiplier=deck_settings.EXPONENTIAL_MULTIPLIER,
+        min=deck_settings.EXPONENTIAL_MIN_WAIT,
+        max=deck_settings.EXPONENTIAL_MAX_WAIT,
+    ),
+    retry=retry_if_exception_type((httpx.HTTPError)),
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    after=after_log(logger, logging.INFO),
+)
 
-async def run_pipeline():
-    TOTAL_PAGES = 17
 
+async def run_pipeline(full: bool = False):
     async with httpx.AsyncClient() as http_client, get_async_db_session() as db_session:
         extractor = FLDeckExtractor(deck_settings, http_client)
         transformer = DeckTransformer()
+        known_deck_ids, watermark = await get_known_decks(db_session)
+
+        # A full sync crawls every page, still skipping decks already loaded
+        if full:
+            watermark = None
+        limiter = AdaptiveLimiter(
+            name="deck scrapes",
+            max_concurrency=deck_settings.LIMITER_MAX_CONCURRENT,
+            max_rate=deck_settings.LIMITER_MAX_PER_SECOND,
+            latency_target=deck_settings.LIMITER_LATENCY_TARGET,
+            is_congestion=is_http_congestion,
+            initial_concurrency=deck_settings.LIMITER_INITIAL_CONCURRENT,
+            initial_rate=deck_settings.LIMITER_INITIAL_PER_SECOND,
+        )
+
+        # Deck ids stream from the page fetches straight to the deck workers, and
+        # the limiter paces both, so no slot waits for a page to be processed
+        deck_ids: asyncio.Queue[int | None] = asyncio.Queue()
+
+        async with asyncio.TaskGroup() as task_group:
+            deck_workers = [
+                task_group.create_task(
+                    process_decks(extractor, transformer, limiter, db_session, deck_ids)
+                )
+                for _ in range(deck_settings.LIMITER_MAX_CONCURRENT)
+            ]
+
+            await discover_deck_ids(
+                extractor,
+                transformer,
+                limiter,
+                deck_ids,
+                known_deck_ids,
+                watermark,
+                stop_at_known_page=not full,
+            )
+
+            for _ in deck_workers:
+                deck_ids.put_nowait(None)
 
-        for page_num in range(1, TOTAL_PAGES + 1):
-            logger.info("Processing page number %s", page_num)
+        logger.info("Deck scrape limiter: %s", limiter.snapshot())
 
-            page_of_decks = await extractor.get_page_of_decks(page_num)
-            deck_ids = [int(deck.get("id")) for deck in page_of_decks]
 
-            if not deck_ids:
-                logger.warning("No decks found in page number %s", page_num)
+async def get_known_decks(db_session: AsyncSession) -> tuple[set[int], datetime | None]:
+    """Get the ids of the decks already loaded, and the newest published_at."""
+    urls = await db_session.scalars(select(EventDeck.url).distinct())
+    watermark = await db_session.scalar(select(func.max(EventDeck.published_at)))
+
+    # Deck urls end with the deck's id, see DeckTransformer
+    known_deck_ids = {int(url.rsplit("/", 1)[-1]) for url in urls}
+
+    logger.info(
+        "Found %s decks already loaded, published up to %s",
+        len(known_deck_ids),
+        watermark,
+    )
+    return known_deck_ids, watermark
+
+
+async def discover_deck_ids(
+    extractor: FLDeckExtractor,
+    transformer: DeckTransformer,
+    limiter: AdaptiveLimiter,
+    deck_ids: asyncio.Queue,
+    known_deck_ids: set[int],
+    watermark: datetime | None,
+    stop_at_known_page: bool,
+) -> None:
+    """Fetch pages of decks concurrently until one is empty, queueing their deck ids."""
+    page_nums = itertools.count(1)
+    last_page = math.inf
+    failures_in_a_row = 0
+    seen_deck_ids = set()
+
+    async def fetch_pages() -> None:
+        nonlocal last_page, failures_in_a_row
+
+        # Workers take the next page number in turn, so at most PAGE_WORKERS pages
+        # past the last one are probed, and as many failing pages in a row stop them
+        while (page_num := next(page_nums)) < last_page:
+            if failures_in_a_row >= deck_settings.PAGE_WORKERS:
+                logger.error(
+                    "Stopping page discovery after %s failed pages in a row",
+                    failures_in_a_row,
+                )
+                return
+
+            try:
+                page_of_decks = await fetch_page_of_decks(extractor, limiter, page_num)
+                failures_in_a_row = 0
+
+            except RetryError:
+                failures_in_a_row += 1
+                logger.error(
+                    "Page %s failed after %s retries",
+                    page_num,
+                    deck_settings.MAX_RETRIES,
+                )
+                continue
+
+            if not page_of_decks:
+                logger.info("Page %s is empty, no pages are left", page_num)
+                last_page = min(last_page, page_num)
                 continue
 
-            await aiometer.run_on_each(
-                async_fn=functools.partial(
-                    process_deck_wrapper,
-                    extractor,
-                    transformer,
-                    db_session,
-                ),
-                args=deck_ids,
-                max_at_once=deck_settings.AIOMETER_MAX_CONCURRENT,
-                max_per_second=deck_settings.AIOMETER_MAX_PER_SECOND,
+            new_decks = [
+                deck
+                for deck in page_of_decks
+                if not is_known_deck(deck, known_deck_ids)
+            ]
+            logger.info(
+                "Found %s new of %s decks in page %s",
+                len(new_decks),
+                len(page_of_decks),
+                page_num,
             )
 
+            # Pages shift when decks are published mid scrape, repeating some decks
+            for deck in new_decks:
+                deck_id = int(deck.get("id"))
+
+                if deck_id not in seen_deck_ids:
+                    seen_deck_ids.add(deck_id)
+                    deck_ids.put_nowait(deck_id)
+
+            # Pages are sorted newest first, and new decks published before the
+            # watermark are still queued above, it only decides when to stop
+            if stop_at_known_page and all(
+                is_known_deck(deck, known_deck_ids)
+                or is_before_watermark(deck, transformer, watermark)
+                for deck in page_of_decks
+            ):
+                logger.info("Page %s has no decks after %s", page_num, watermark)
+                last_page = min(last_page, page_num)
+
+    async with asyncio.TaskGroup() as task_group:
+        for _ in range(deck_settings.PAGE_WORKERS):
+            task_group.create_task(fetch_pages())
+
+    logger.info("Found %s decks to process", len(seen_deck_ids))
+
+
+def is_known_deck(deck: dict, known_deck_ids: set[int]) -> bool:
+    """Whether a listed deck is already loaded."""
+    return int(deck.get("id")) in known_deck_ids
+
+
+def is_before_watermark(
+    deck: dict, transformer: DeckTransformer, watermark: datetime | None
+) -> bool:
+    """Whether a listed deck was published before the newest loaded deck."""
+    if watermark is None:
+        return False
+
+    try:
+        published_at = transformer.clean_published_at(deck.get("publishDate"))
+    except ValueError:
+        return False
+
+    return published_at is not None and published_at < watermark
+
+
+def is_http_congestion(error: Exception) -> bool:
+    """Timeouts, 429s and 503s signal that formatlibrary wants fewer requests."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in (429, 503)
+
+    return isinstance(error, httpx.TimeoutException)
+
+
+async def process_decks(
+    extractor: FLDeckExtractor,
+    transformer: DeckTransformer,
+    limiter: AdaptiveLimiter,
+    db_session: AsyncSession,
+    deck_ids: asyncio.Queue,
+) -> None:
+    """Process queued deck ids until a None says discovery is done."""
+    while (deck_id := await deck_ids.get()) is not None:
+        await process_deck_wrapper(extractor, transformer, limiter, db_session, deck_id)
+
 
 async def process_deck_wrapper(
     extractor: FLDeckExtractor,
     transformer: DeckTransformer,
+    limiter: AdaptiveLimiter,
     db_session: AsyncSession,
     deck_id: int,
 ) -> None:
     try:
-        await process_deck(extractor, transformer, db_session, deck_id)
+        await process_deck(extractor, transformer, limiter, db_session, deck_id)
 
     except RetryError:
         logger.error(
@@ -73,25 +247,25 @@ async def process_deck_wrapper(
         )
 
 
-@retry(
-    stop=stop_after_attempt(deck_settings.MAX_RETRIES),
-    wait=wait_exponential(
-        multiplier=deck_settings.EXPONENTIAL_MULTIPLIER,
-        min=deck_settings.EXPONENTIAL_MIN_WAIT,
-        max=deck_settings.EXPONENTIAL_MAX_WAIT,
-    ),
-    retry=retry_if_exception_type((httpx.HTTPError)),
-    before_sleep=before_sleep_log(logger, logging.WARNING),
-    after=after_log(logger, logging.INFO),
-)
+@http_retry
+async def fetch_page_of_decks(
+    extractor: FLDeckExtractor, limiter: AdaptiveLimiter, page_num: int
+) -> list[dict]:
+    async with limiter.slot():
+        return await extractor.get_page_of_decks(page_num)
+
+
+@http_retry
 async def process_deck(
     extractor: FLDeckExtractor,
     transformer: DeckTransformer,
+    limiter: AdaptiveLimiter,
     db_session: AsyncSession,
     deck_id: int,
 ) -> None:
     # Extract deck json
-    deck_data = await extractor.get_deck(deck_id)
+    async with limiter.slot():
+        deck_data = await extractor.get_deck(deck_id)
 
     # Transform deck json to dataframe
     transformed_df = transformer.transform_deck_data(deck_data, deck_id)
@@ -125,9 +299,21 @@ async def load_deck_to_db(
         # Add object to sqlalchemy session
         db_session.add(event_deck)
 
-    # Commit changes to database
-    db_session.commit()
+    # Deck tasks share the session, so get_async_db_session commits once at the end
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Load the Goat event decks published on FormatLibrary."
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Crawl every page, instead of stopping at the first page of known decks.",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    asyncio.run(run_pipeline())
+    args = parse_args()
+    asyncio.run(run_pipeline(full=args.full))
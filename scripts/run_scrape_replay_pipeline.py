@@ -1,11 +1,11 @@
 import asyncio
-import functools
 import logging
+from collections import defaultdict
 from pathlib import Path
+from uuid import UUID
 
-import aiometer
 from playwright.async_api import Error as PlaywrightError
-from playwright.async_api import TimeoutError, async_playwright
+from playwright.async_api import Playwright, TimeoutError, async_playwright
 from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
@@ -21,46 +21,153 @@ from tenacity import (
 
 from gfwldata.config.replay import replay_settings
 from gfwldata.config.settings import settings
+from gfwldata.extractors.browser_pool import BrowserPool
 from gfwldata.extractors.replay_extractor import (
     ReplayExtractionError,
     ReplayExtractor,
 )
-from gfwldata.utils.db import get_async_db_session
+from gfwldata.loaders.job_state_writer import JobStateWriter
+from gfwldata.utils.db import async_engine, chunks, get_async_db_session, sync_engine
+from gfwldata.utils.job_leases import JobLeaser
 from gfwldata.utils.logger import setup_logger
 from gfwldata.utils.models import Job, JobState, LeagueMatch
-from gfwldata.utils.s3 import AsyncS3Client, get_async_s3_session
+from gfwldata.utils.rate_limiter import AdaptiveLimiter
+from gfwldata.utils.s3 import AsyncS3Client, S3Client, get_async_s3_session
 
 setup_logger(Path("gfwldata/logs/run_scrape_replay_pipeline.log"))
 logger = logging.getLogger("scripts.run_scrape_replay_pipeline")
 
+BUCKET_NAME = "gfwl"
+
 
 async def run_pipeline():
-    BUCKET_NAME = "gfwl"
+    uploaded_keys = set()
 
-    async with (
-        get_async_db_session() as db_session,
-        async_playwright() as playwright_client,
-        get_async_s3_session(settings, BUCKET_NAME) as s3_session,
-    ):
+    async with get_async_db_session() as db_session:
         pending_jobs = await get_pending_jobs(db_session)
 
-        if not pending_jobs:
-            logger.info("No pending jobs found. Exiting pipeline.")
-            return
+        # Replays already in s3, e.g. after a database reset, are never scraped again
+        if pending_jobs:
+            uploaded_keys = await asyncio.to_thread(get_uploaded_replay_keys)
+            await mark_uploaded_jobs(db_session, pending_jobs, uploaded_keys)
+
+    # Workers on other processes or hosts claim jobs under their own leases
+    leaser = JobLeaser(
+        sync_engine,
+        JobState.S3_PENDING,
+        JobState.S3_IN_PROGRESS,
+        replay_settings.LEASE_SECONDS,
+    )
+
+    # Tasks queue their job states for a single writer, instead of sharing a session,
+    # and it's closed before the leaser releases the jobs it still holds
+    with leaser:
+        async with (
+            async_playwright() as playwright_client,
+            get_async_s3_session(settings, BUCKET_NAME) as s3_session,
+            JobStateWriter(
+                async_engine,
+                replay_settings.JOB_STATE_BATCH_SIZE,
+                replay_settings.JOB_STATE_FLUSH_INTERVAL,
+                leaser.owner,
+            ) as job_state_writer,
+        ):
+            await scrape_claimed_jobs(
+                leaser, playwright_client, s3_session, job_state_writer, uploaded_keys
+            )
 
-        extractor = ReplayExtractor(replay_settings, playwright_client)
 
-        await aiometer.run_on_each(
-            async_fn=functools.partial(
-                process_job_wrapper, extractor, db_session, s3_session
-            ),
-            args=pending_jobs,
-            max_at_once=replay_settings.AIOMETER_MAX_CONCURRENT,
-            max_per_second=replay_settings.AIOMETER_MAX_PER_SECOND,
+async def scrape_claimed_jobs(
+    leaser: JobLeaser,
+    playwright_client: Playwright,
+    s3_session: AsyncS3Client,
+    job_state_writer: JobStateWriter,
+    uploaded_keys: set[str],
+) -> None:
+    """Claims and scrapes jobs until none are pending or left with an expired lease."""
+    # Connections and pages are reused across jobs instead of opened per job
+    async with BrowserPool(
+        replay_settings,
+        playwright_client,
+        blocked_resource_types=(
+            replay_settings.BLOCKED_RESOURCE_TYPES
+            if replay_settings.CAPTURE_MODE == "network"
+            else None
+        ),
+    ) as browser_pool:
+        extractor = ReplayExtractor(replay_settings, browser_pool)
+        limiter = AdaptiveLimiter(
+            name="replay scrapes",
+            max_concurrency=replay_settings.LIMITER_MAX_CONCURRENT,
+            max_rate=replay_settings.LIMITER_MAX_PER_SECOND,
+            latency_target=replay_settings.LIMITER_LATENCY_TARGET,
+            is_congestion=is_scrape_congestion,
+            initial_concurrency=replay_settings.LIMITER_INITIAL_CONCURRENT,
+            initial_rate=replay_settings.LIMITER_INITIAL_PER_SECOND,
+        )
+
+        # Claimed replays stream to the workers, and the next batch is claimed as
+        # soon as this one fits in the queue, so no batch waits on its slowest scrape
+        replays: asyncio.Queue[tuple[list[UUID], str, str] | None] = asyncio.Queue(
+            maxsize=replay_settings.LIMITER_MAX_CONCURRENT
         )
+        replay_locks = defaultdict(asyncio.Lock)
 
+        # The limiter paces scrapes, the workers only cap the number of open jobs
+        async with asyncio.TaskGroup() as task_group:
+            replay_workers = [
+                task_group.create_task(
+                    process_replays(
+                        extractor,
+                        limiter,
+                        job_state_writer,
+                        s3_session,
+                        uploaded_keys,
+                        replays,
+                        replay_locks,
+                    )
+                )
+                for _ in range(replay_settings.LIMITER_MAX_CONCURRENT)
+            ]
+
+            while claimed_jobs := await claim_jobs(leaser):
+                for replay in complete_uploaded_replays(
+                    job_state_writer, group_jobs_by_replay(claimed_jobs), uploaded_keys
+                ):
+                    await replays.put(replay)
+
+            for _ in replay_workers:
+                await replays.put(None)
+
+        logger.info("Replay scrape limiter: %s", limiter.snapshot())
+
+
+async def process_replays(
+    extractor: ReplayExtractor,
+    limiter: AdaptiveLimiter,
+    job_state_writer: JobStateWriter,
+    s3_session: AsyncS3Client,
+    uploaded_keys: set[str],
+    replays: asyncio.Queue,
+    replay_locks: defaultdict[str, asyncio.Lock],
+) -> None:
+    """Scrapes replays from the queue until it hands out None."""
+    while (replay := await replays.get()) is not None:
+        # A replay split across claims is queued once per claim, and the later copy
+        # waits for the earlier scrape, only completing its jobs if it was uploaded
+        async with replay_locks[replay[1]]:
+            if complete_uploaded_replays(job_state_writer, [replay], uploaded_keys):
+                await process_job_wrapper(
+                    extractor,
+                    limiter,
+                    job_state_writer,
+                    s3_session,
+                    uploaded_keys,
+                    replay,
+                )
 
-async def get_pending_jobs(db_session: AsyncSession) -> list[tuple[str, str, str]]:
+
+async def get_pending_jobs(db_session: AsyncSession) -> list[tuple[UUID, str, str]]:
     """Fetches pending jobs from the database."""
     statement = (
         select(Job.league_match_id, Job.s3_key, LeagueMatch.replay_url)
@@ -74,29 +181,140 @@ async def get_pending_jobs(db_session: AsyncSession) -> list[tuple[str, str, str
     return pending_jobs
 
 
+async def claim_jobs(leaser: JobLeaser) -> list[tuple[UUID, str, str]]:
+    """Claims the next batch of jobs, in s3_key order so shared replays are adjacent."""
+    league_match_ids = await asyncio.to_thread(
+        leaser.claim, replay_settings.LEASE_CLAIM_SIZE
+    )
+    if not league_match_ids:
+        return []
+
+    statement = (
+        select(Job.league_match_id, Job.s3_key, LeagueMatch.replay_url)
+        .join(LeagueMatch.jobs)
+        .filter(Job.league_match_id.in_(league_match_ids))
+        .order_by(Job.s3_key)
+    )
+    async with get_async_db_session() as db_session:
+        result = await db_session.execute(statement)
+        return result.all()
+
+
+def get_uploaded_replay_keys() -> set[str]:
+    """Lists the replays folder in s3 once, returning the s3 keys of its replays."""
+    s3_client = S3Client(settings, BUCKET_NAME)
+    prefix = replay_settings.S3_PREFIX
+
+    return {
+        key.removeprefix(prefix)
+        for key in s3_client.list_objects(prefix)
+        if key != prefix
+    }
+
+
+async def mark_uploaded_jobs(
+    db_session: AsyncSession,
+    pending_jobs: list[tuple[UUID, str, str]],
+    uploaded_keys: set[str],
+) -> None:
+    """Bulk marks pending jobs whose replay is already in s3 as completed."""
+    uploaded_ids = [job[0] for job in pending_jobs if job[1] in uploaded_keys]
+
+    # Chunked to stay under the database's limit of bound parameters
+    for league_match_ids in chunks(uploaded_ids, 1000):
+        await db_session.execute(
+            update(Job)
+            .where(Job.league_match_id.in_(league_match_ids))
+            .values(state=JobState.S3_COMPLETED)
+        )
+    await db_session.commit()
+
+    logger.info("Marked %s jobs already in s3 as completed.", len(uploaded_ids))
+
+
+def group_jobs_by_replay(
+    pending_jobs: list[tuple[UUID, str, str]],
+) -> list[tuple[list[UUID], str, str]]:
+    """
+    Collapses jobs of league matches sharing a replay into one job per replay.
+
+    The s3 key is derived from the replay_id, so each replay is scraped once
+    and its state is set on every job that points at it.
+    """
+    jobs_by_key = defaultdict(list)
+    replay_urls = {}
+
+    for job_id, s3_key, replay_url in pending_jobs:
+        jobs_by_key[s3_key].append(job_id)
+        replay_urls.setdefault(s3_key, replay_url)
+
+    if len(jobs_by_key) < len(pending_jobs):
+        logger.info(
+            "Collapsed %s pending jobs into %s replays to scrape.",
+            len(pending_jobs),
+            len(jobs_by_key),
+        )
+
+    return [
+        (job_ids, s3_key, replay_urls[s3_key])
+        for s3_key, job_ids in jobs_by_key.items()
+    ]
+
+
+def complete_uploaded_replays(
+    job_state_writer: JobStateWriter,
+    replays: list[tuple[list[UUID], str, str]],
+    uploaded_keys: set[str],
+) -> list[tuple[list[UUID], str, str]]:
+    """Marks the jobs of replays already uploaded as completed, returning the rest."""
+    replays_to_scrape = []
+
+    for job_ids, s3_key, replay_url in replays:
+        if s3_key in uploaded_keys:
+            for job_id in job_ids:
+                job_state_writer.set_state(job_id, JobState.S3_COMPLETED)
+        else:
+            replays_to_scrape.append((job_ids, s3_key, replay_url))
+
+    if len(replays_to_scrape) < len(replays):
+        logger.info(
+            "Completed the jobs of %s replays already uploaded.",
+            len(replays) - len(replays_to_scrape),
+        )
+
+    return replays_to_scrape
+
+
+def is_scrape_congestion(error: Exception) -> bool:
+    """Timeouts and browser or transport errors signal an overloaded scraper."""
+    # Replays missing from a loaded page don't, unless waiting for them timed out
+    return isinstance(error, (PlaywrightError, asyncio.TimeoutError)) or isinstance(
+        error.__cause__, asyncio.TimeoutError
+    )
+
+
 async def process_job_wrapper(
     extractor: ReplayExtractor,
-    db_session: AsyncSession,
+    limiter: AdaptiveLimiter,
+    job_state_writer: JobStateWriter,
     s3_session: AsyncS3Client,
-    job: tuple[str, str, str],
+    uploaded_keys: set[str],
+    job: tuple[list[UUID], str, str],
 ):
     """Wraps process_job to handle RetryError."""
     try:
-        await process_job(extractor, db_session, s3_session, job)
+        await process_job(
+            extractor, limiter, job_state_writer, s3_session, uploaded_keys, job
+        )
 
     except RetryError:
-        job_id = job[0]
-        statement = (
-            update(Job)
-            .where(Job.league_match_id == job_id)
-            .values(state=JobState.S3_FAILED)
-        )
-        await db_session.execute(statement)
-        await db_session.commit()
+        job_ids = job[0]
+        for job_id in job_ids:
+            job_state_writer.set_state(job_id, JobState.S3_FAILED)
 
         logger.error(
-            "Job %s exceeded %s retries and has been marked as failed.",
-            job_id,
+            "Jobs %s exceeded %s retries and have been marked as failed.",
+            job_ids,
             replay_settings.MAX_RETRIES,
         )
 
@@ -116,21 +334,32 @@ async def process_job_wrapper(
 )
 async def process_job(
     extractor: ReplayExtractor,
-    db_session: AsyncSession,
+    limiter: AdaptiveLimiter,
+    job_state_writer: JobStateWriter,
     s3_session: AsyncS3Client,
-    job: tuple[str, str, str],
+    uploaded_keys: set[str],
+    job: tuple[list[UUID], str, str],
 ) -> None:
-    """Processes a single job: extracts replay JSON, uploads to S3, updates the DB."""
-    job_id, s3_key, replay_url = job
+    """Processes a single replay: extracts its JSON, uploads to S3, queues its jobs."""
+    job_ids, s3_key, replay_url = job
 
-    replay_json = await extractor.extract_replay_json(replay_url)
+    # Each attempt reports to the limiter, while retry backoff waits outside it
+    async with limiter.slot():
+        replay_json = await extractor.extract_replay_json(replay_url)
 
-    load_result = await s3_session.put_object(f"replays/{s3_key}", replay_json, "json")
+    load_result = await s3_session.put_object(
+        f"{replay_settings.S3_PREFIX}{s3_key}",
+        replay_json,
+        replay_settings.S3_FILETYPE,
+    )
 
-    state = JobState.S3_COMPLETED if load_result else JobState.S3_PENDING
-    statement = update(Job).where(Job.league_match_id == job_id).values(state=state)
-    await db_session.execute(statement)
-    await db_session.commit()
+    if load_result:
+        uploaded_keys.add(s3_key)
+
+    # Failed uploads aren't left pending, so the claim loop can't pick them up again
+    state = JobState.S3_COMPLETED if load_result else JobState.S3_FAILED
+    for job_id in job_ids:
+        job_state_writer.set_state(job_id, state)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+import os
+import uuid
+
+# Settings are read from the environment on import, so set test defaults first
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+os.environ.setdefault("SBR_WS_ENDPOINT", "ws://localhost")
+os.environ.setdefault("S3_CACHE_ENABLED", "false")
+
+import pytest
+from sqlalchemy import Engine, create_engine, insert
+
+from gfwldata.utils.models import Base, Job, JobState
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """An sqlite database file, shared by threads unlike an in-memory one."""
+    path = tmp_path / "gfwldata.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    return path
+
+
+@pytest.fixture
+def engine(db_path) -> Engine:
+    engine = create_engine(f"sqlite:///{db_path}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def add_jobs(engine):
+    """Insert n jobs in state, returning their league_match_ids in s3_key order."""
+
+    def add_jobs(n: int, state: JobState, **values) -> list:
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "league_match_id": uuid.uuid4(),
+                "state": state,
+                "s3_key": f"{i:04d}_replay.json",
+                **values,
+            }
+            for i in range(n)
+        ]
+        with engine.begin() as connection:
+            connection.execute(insert(Job.__table__), rows)
+
+        return [row["league_match_id"] for row in rows]
+
+    return add_jobs
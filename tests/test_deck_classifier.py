@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from gfwldata.config.replay_parser import replay_parser_settings
+from gfwldata.transformers.deck_classifier import DeckClassifier, PredictionCache
+
+
+@pytest.fixture
+def classifier(tmp_path) -> DeckClassifier:
+    """A classifier with a small vocabulary, for tests that don't predict."""
+    vocabulary_path = tmp_path / "vocabulary.npy"
+    np.save(vocabulary_path, np.asarray(["jinzo", "sangan", "scapegoat"], dtype=str))
+    np.save(tmp_path / "idf.npy", np.asarray([1.0, 2.0, 3.0]))
+
+    classifier = DeckClassifier.__new__(DeckClassifier)
+    classifier.vocabulary = np.load(vocabulary_path, mmap_mode="r")
+    classifier.idf = np.load(tmp_path / "idf.npy", mmap_mode="r")
+    return classifier
+
+
+def test_vectorize_matches_tfidf(classifier):
+    matrix = classifier._vectorize(
+        [
+            [
+                {"card_name": "Sangan", "card_amount": 1},
+                {"card_name": "Scapegoat", "card_amount": 1},
+                # Repeated cards add up, and unknown cards are dropped
+                {"card_name": "sangan", "card_amount": 1},
+                {"card_name": "Unknown Card", "card_amount": 3},
+                {"card_name": "zzz", "card_amount": 1},
+            ],
+            [],
+            [{"card_name": "Jinzo", "card_amount": 2}],
+        ]
+    )
+
+    expected = np.array([[0.0, 4.0, 3.0], [0.0, 0.0, 0.0], [2.0, 0.0, 0.0]])
+    expected[0] /= 5.0
+    expected[2] /= 2.0
+    np.testing.assert_allclose(matrix.toarray(), expected)
+
+
+def test_missing_artifacts_name_the_export_command(tmp_path):
+    config = replay_parser_settings.model_copy(
+        update={"BOOSTER_PATH": str(tmp_path / "xgboost_model.ubj")}
+    )
+
+    with pytest.raises(FileNotFoundError, match="make model-export"):
+        DeckClassifier(config)
+
+
+def test_prediction_cache_evicts_the_least_recently_used():
+    cache = PredictionCache(max_size=2)
+    cache.put("a", ("Chaos Turbo", 0.9))
+    cache.put("b", ("Warrior", 0.8))
+
+    # Reading a makes b the least recently used
+    assert cache.get("a") == ("Chaos Turbo", 0.9)
+    cache.put("c", ("Goat Control", 0.7))
+
+    assert cache.get("b") is None
+    assert cache.get("c") == ("Goat Control", 0.7)
+    assert cache.info() == {
+        "hits": 2,
+        "misses": 1,
+        "hit_rate": 0.6667,
+        "size": 2,
+        "max_size": 2,
+    }
+
+
+def test_prediction_cache_of_size_zero_caches_nothing():
+    cache = PredictionCache(max_size=0)
+    cache.put("a", ("Chaos Turbo", 0.9))
+
+    assert cache.get("a") is None
+    assert cache.info()["size"] == 0
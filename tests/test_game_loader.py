@@ -0,0 +1,102 @@
+from datetime import datetime
+
+from sqlalchemy import insert, select
+
+from gfwldata.loaders.game_loader import GameLoader
+from gfwldata.utils.models import Game, Job, JobState
+
+
+def game_row(league_match_id, game_number: int = 1) -> dict:
+    return {
+        "league_match_id": league_match_id,
+        "played_at": datetime(2024, 1, 1),
+        "player1": "alice",
+        "player2": "bob",
+        "player1_deck_type": "Chaos Turbo",
+        "player1_deck_type_confidence": 0.9,
+        "player2_deck_type": "Warrior",
+        "player2_deck_type_confidence": 0.8,
+        "player1_cards": [{"card_name": "Sangan", "card_amount": 1}],
+        "player2_cards": [],
+        "game_number": game_number,
+        "game_winner": "alice",
+        "went_first": "bob",
+    }
+
+
+def games_by_match(engine) -> dict:
+    with engine.connect() as connection:
+        rows = connection.execute(select(Game.league_match_id, Game.game_number))
+
+    games = {}
+    for league_match_id, game_number in rows:
+        games.setdefault(league_match_id, []).append(game_number)
+
+    return games
+
+
+def job_states(engine) -> dict:
+    with engine.connect() as connection:
+        return dict(connection.execute(select(Job.league_match_id, Job.state)).all())
+
+
+def test_flush_writes_games_and_job_states(engine, add_jobs):
+    completed, failed = add_jobs(2, JobState.PARSER_IN_PROGRESS)
+    loader = GameLoader(engine, batch_size=100)
+
+    loader.add([game_row(completed, 1), game_row(completed, 2)], [completed], [failed])
+    assert games_by_match(engine) == {}
+
+    loader.flush()
+
+    assert games_by_match(engine) == {completed: [1, 2]}
+    assert job_states(engine) == {
+        completed: JobState.PARSER_COMPLETED,
+        failed: JobState.PARSER_FAILED,
+    }
+
+
+def test_add_flushes_full_batches(engine, add_jobs):
+    league_match_ids = add_jobs(3, JobState.PARSER_IN_PROGRESS)
+    loader = GameLoader(engine, batch_size=2)
+
+    for league_match_id in league_match_ids:
+        loader.add([game_row(league_match_id)], [league_match_id], [])
+
+    assert len(games_by_match(engine)) == 2
+    assert len(loader.completed_ids) == 1
+
+
+def test_reparsed_matches_replace_their_games(engine, add_jobs):
+    (league_match_id,) = add_jobs(1, JobState.PARSER_IN_PROGRESS)
+    loader = GameLoader(engine, batch_size=100)
+
+    loader.add(
+        [game_row(league_match_id, 1), game_row(league_match_id, 2)],
+        [league_match_id],
+        [],
+    )
+    loader.flush()
+    loader.add([game_row(league_match_id, 3)], [league_match_id], [])
+    loader.flush()
+
+    assert games_by_match(engine) == {league_match_id: [3]}
+
+
+def test_flush_skips_jobs_leased_by_another_worker(engine, add_jobs):
+    held = add_jobs(1, JobState.PARSER_IN_PROGRESS, lease_owner="worker-a")[0]
+    taken_over = add_jobs(1, JobState.PARSER_IN_PROGRESS, lease_owner="worker-b")[0]
+    loader = GameLoader(engine, batch_size=100, lease_owner="worker-a")
+
+    # The other worker's games of the taken over job are kept
+    with engine.begin() as connection:
+        connection.execute(insert(Game.__table__), [game_row(taken_over, 1)])
+
+    loader.add([game_row(held), game_row(taken_over, 2)], [held, taken_over], [])
+    loader.flush()
+
+    assert games_by_match(engine) == {held: [1], taken_over: [1]}
+    assert job_states(engine) == {
+        held: JobState.PARSER_COMPLETED,
+        taken_over: JobState.PARSER_IN_PROGRESS,
+    }
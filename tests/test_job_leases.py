@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+from sqlalchemy import select, update
+
+from gfwldata.utils.job_leases import JobLeaser, utcnow
+from gfwldata.utils.models import Job, JobState
+
+
+def leaser(engine, owner: str) -> JobLeaser:
+    return JobLeaser(
+        engine,
+        JobState.PARSER_PENDING,
+        JobState.PARSER_IN_PROGRESS,
+        lease_seconds=60,
+        owner=owner,
+    )
+
+
+def jobs(engine) -> dict:
+    statement = select(Job.league_match_id, Job.state, Job.lease_owner)
+    with engine.connect() as connection:
+        return {row[0]: row[1:] for row in connection.execute(statement)}
+
+
+def test_claims_are_disjoint_and_in_s3_key_order(engine, add_jobs):
+    league_match_ids = add_jobs(5, JobState.PARSER_PENDING)
+    worker_a, worker_b = leaser(engine, "a"), leaser(engine, "b")
+
+    claimed_a = worker_a.claim(3)
+    claimed_b = worker_b.claim(3)
+
+    assert sorted(claimed_a, key=league_match_ids.index) == league_match_ids[:3]
+    assert sorted(claimed_b, key=league_match_ids.index) == league_match_ids[3:]
+    assert worker_a.claim(3) == []
+    assert jobs(engine)[claimed_a[0]] == (JobState.PARSER_IN_PROGRESS, "a")
+
+
+def test_only_claimable_states_are_claimed(engine, add_jobs):
+    add_jobs(1, JobState.S3_PENDING)
+    add_jobs(1, JobState.PARSER_COMPLETED)
+
+    assert leaser(engine, "a").claim(10) == []
+
+
+def test_expired_leases_are_reclaimed(engine, add_jobs):
+    league_match_ids = add_jobs(2, JobState.PARSER_PENDING)
+    worker_a, worker_b = leaser(engine, "a"), leaser(engine, "b")
+    worker_a.claim(2)
+
+    # Worker a died, and one of its leases ran out
+    with engine.begin() as connection:
+        connection.execute(
+            update(Job)
+            .where(Job.league_match_id == league_match_ids[0])
+            .values(lease_expires_at=utcnow() - timedelta(seconds=1))
+        )
+
+    assert worker_b.claim(2) == [league_match_ids[0]]
+    assert jobs(engine)[league_match_ids[0]] == (JobState.PARSER_IN_PROGRESS, "b")
+
+
+def test_renew_extends_only_held_leases(engine, add_jobs):
+    add_jobs(3, JobState.PARSER_PENDING)
+    worker_a, worker_b = leaser(engine, "a"), leaser(engine, "b")
+    worker_a.claim(2)
+    claimed_b = worker_b.claim(1)
+
+    with engine.begin() as connection:
+        connection.execute(
+            update(Job).values(lease_expires_at=utcnow() - timedelta(seconds=1))
+        )
+
+    # Only worker b's lease is left expired, for another worker to reclaim
+    assert worker_a.renew() == 2
+    assert leaser(engine, "c").claim(3) == claimed_b
+
+
+def test_exiting_releases_unfinished_jobs(engine, add_jobs):
+    finished, unfinished = add_jobs(2, JobState.PARSER_PENDING)
+
+    with leaser(engine, "a") as worker:
+        worker.claim(2)
+
+        with engine.begin() as connection:
+            connection.execute(
+                update(Job)
+                .where(Job.league_match_id == finished)
+                .values(state=JobState.PARSER_COMPLETED, lease_owner=None)
+            )
+
+    assert jobs(engine) == {
+        finished: (JobState.PARSER_COMPLETED, None),
+        unfinished: (JobState.PARSER_PENDING, None),
+    }
@@ -0,0 +1,92 @@
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from gfwldata.loaders.job_state_writer import JobStateWriter
+from gfwldata.utils.models import Job, JobState
+
+
+def job_states(engine) -> dict:
+    statement = select(Job.league_match_id, Job.state, Job.lease_owner)
+    with engine.connect() as connection:
+        return {row[0]: row[1:] for row in connection.execute(statement)}
+
+
+def run_writer(db_path, transitions, **kwargs) -> None:
+    async def main():
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+        settings = {"batch_size": 100, "flush_interval": 60, **kwargs}
+
+        async with JobStateWriter(async_engine, **settings) as writer:
+            for league_match_id, state in transitions:
+                writer.set_state(league_match_id, state)
+
+        await async_engine.dispose()
+
+    asyncio.run(main())
+
+
+def test_closing_flushes_buffered_states(engine, db_path, add_jobs):
+    completed, failed = add_jobs(2, JobState.S3_IN_PROGRESS, lease_owner="a")
+
+    # Neither the batch size nor the flush interval is reached before closing
+    run_writer(
+        db_path,
+        [(completed, JobState.S3_COMPLETED), (failed, JobState.S3_FAILED)],
+    )
+
+    assert job_states(engine) == {
+        completed: (JobState.S3_COMPLETED, None),
+        failed: (JobState.S3_FAILED, None),
+    }
+
+
+def test_later_transitions_replace_earlier_ones(engine, db_path, add_jobs):
+    (league_match_id,) = add_jobs(1, JobState.S3_IN_PROGRESS)
+
+    run_writer(
+        db_path,
+        [
+            (league_match_id, JobState.S3_FAILED),
+            (league_match_id, JobState.S3_COMPLETED),
+        ],
+    )
+
+    assert job_states(engine)[league_match_id][0] == JobState.S3_COMPLETED
+
+
+def test_full_batches_are_flushed_while_running(engine, db_path, add_jobs, caplog):
+    league_match_ids = add_jobs(5, JobState.S3_IN_PROGRESS)
+    caplog.set_level("INFO", logger="gfwldata.loaders.job_state_writer")
+
+    run_writer(
+        db_path,
+        [
+            (league_match_id, JobState.S3_COMPLETED)
+            for league_match_id in league_match_ids
+        ],
+        batch_size=2,
+    )
+
+    # Two full batches, then the last transition on close
+    assert [record.args[0] for record in caplog.records] == [2, 2, 1]
+    assert {state for state, _ in job_states(engine).values()} == {
+        JobState.S3_COMPLETED
+    }
+
+
+def test_jobs_leased_by_another_worker_are_skipped(engine, db_path, add_jobs):
+    held = add_jobs(1, JobState.S3_IN_PROGRESS, lease_owner="a")[0]
+    taken_over = add_jobs(1, JobState.S3_IN_PROGRESS, lease_owner="b")[0]
+
+    run_writer(
+        db_path,
+        [(held, JobState.S3_COMPLETED), (taken_over, JobState.S3_COMPLETED)],
+        lease_owner="a",
+    )
+
+    assert job_states(engine) == {
+        held: (JobState.S3_COMPLETED, None),
+        taken_over: (JobState.S3_IN_PROGRESS, "b"),
+    }
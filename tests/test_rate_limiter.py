@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from gfwldata.utils.rate_limiter import AdaptiveLimiter
+
+
+def limiter(**kwargs) -> AdaptiveLimiter:
+    settings = {
+        "name": "test",
+        "max_concurrency": 8,
+        "max_rate": 1000,
+        "latency_target": 1.0,
+        "is_congestion": lambda error: isinstance(error, TimeoutError),
+        **kwargs,
+    }
+    return AdaptiveLimiter(**settings)
+
+
+async def request(limiter: AdaptiveLimiter, seconds: float = 0, error=None) -> None:
+    async with limiter.slot():
+        await asyncio.sleep(seconds)
+        if error is not None:
+            raise error
+
+
+def test_concurrency_is_capped():
+    test_limiter = limiter(max_concurrency=2)
+    most_in_flight = 0
+
+    async def tracked_request():
+        nonlocal most_in_flight
+        async with test_limiter.slot():
+            most_in_flight = max(most_in_flight, test_limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(tracked_request() for _ in range(8)))
+
+    asyncio.run(main())
+
+    assert most_in_flight == 2
+    assert test_limiter.succeeded == 8
+
+
+def test_fast_requests_raise_only_the_limits_in_use():
+    test_limiter = limiter(initial_concurrency=1)
+
+    # Sequential requests use the one slot, then never fill the two slots
+    asyncio.run(request(test_limiter))
+    assert test_limiter.concurrency == 2
+
+    asyncio.run(request(test_limiter))
+    assert test_limiter.concurrency == 2
+
+
+def test_congestion_cuts_both_limits_once_per_episode():
+    test_limiter = limiter(initial_concurrency=8, initial_rate=100)
+
+    async def main():
+        for _ in range(2):
+            with pytest.raises(TimeoutError):
+                await request(test_limiter, error=TimeoutError())
+
+    asyncio.run(main())
+
+    assert (test_limiter.concurrency, test_limiter.rate) == (4, 50)
+    assert test_limiter.congestion_signals == 2
+    assert test_limiter.failed == 2
+
+
+def test_other_errors_leave_the_limits():
+    test_limiter = limiter(initial_concurrency=8, initial_rate=100)
+
+    with pytest.raises(ValueError):
+        asyncio.run(request(test_limiter, error=ValueError()))
+
+    assert (test_limiter.concurrency, test_limiter.rate) == (8, 100)
+    assert test_limiter.congestion_signals == 0
+    assert test_limiter.failed == 1
+
+
+def test_slow_requests_cut_the_limits_down_to_their_minimum():
+    test_limiter = limiter(
+        latency_target=0.01,
+        initial_concurrency=2,
+        initial_rate=0.3,
+        min_concurrency=1,
+        min_rate=0.2,
+    )
+
+    asyncio.run(request(test_limiter, seconds=0.02))
+
+    assert (test_limiter.concurrency, test_limiter.rate) == (1, 0.2)
+    assert test_limiter.succeeded == 1
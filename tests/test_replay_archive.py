@@ -0,0 +1,97 @@
+import json
+from pathlib import Path
+
+from gfwldata.config.replay_parser import replay_parser_settings
+from gfwldata.utils.replay_archive import (
+    INDEX_FILENAME,
+    LocalReplayArchive,
+    ReplayArchiveIndex,
+    ReplayArchiveWriter,
+)
+from scripts.compact_replay_archive import upload_season
+
+
+def replay_body(replay_id: int) -> bytes:
+    return json.dumps({"id": replay_id, "plays": ["x" * replay_id]}).encode()
+
+
+def write_season(
+    archive_dir: Path, season: int, replay_ids: range
+) -> ReplayArchiveWriter:
+    with ReplayArchiveWriter(archive_dir, season, max_segment_bytes=64) as writer:
+        for replay_id in replay_ids:
+            writer.add(replay_id, replay_body(replay_id))
+
+    return writer
+
+
+def test_archive_round_trip(tmp_path):
+    writer = write_season(tmp_path, 1, range(1, 50))
+    write_season(tmp_path, 2, range(50, 60))
+
+    index = ReplayArchiveIndex.from_dir(tmp_path)
+    archive = LocalReplayArchive(tmp_path, index)
+
+    assert len(writer.segment_paths) > 1
+    assert len(index) == 59
+    assert all(archive.get(i) == replay_body(i) for i in range(1, 60))
+    assert archive.get(60) is None
+
+    archive.close()
+
+
+def test_archive_skips_segments_that_arent_local(tmp_path):
+    writer = write_season(tmp_path, 1, range(1, 50))
+    index = ReplayArchiveIndex.from_dir(tmp_path)
+    writer.segment_paths[0].unlink()
+
+    archive = LocalReplayArchive(tmp_path, index)
+
+    assert archive.get(1) is None
+    assert archive.get(49) == replay_body(49)
+
+    archive.close()
+
+
+def test_rewriting_a_season_replaces_its_archive(tmp_path):
+    first = write_season(tmp_path, 1, range(1, 50))
+    second = write_season(tmp_path, 1, range(10, 20))
+
+    assert not any(path.exists() for path in first.segment_paths)
+    assert len(ReplayArchiveIndex.from_dir(tmp_path)) == len(second.entries) == 10
+
+
+class FakeS3Client:
+    def __init__(self, keys: list[str]):
+        self.keys = set(keys)
+
+    def upload_file(self, path: Path, key: str) -> bool:
+        self.keys.add(key)
+        return True
+
+    def list_objects(self, prefix: str) -> list[str]:
+        return sorted(key for key in self.keys if key.startswith(prefix))
+
+    def delete_objects(self, keys: list[str]) -> bool:
+        self.keys.difference_update(keys)
+        return True
+
+
+def test_upload_season_deletes_segments_of_earlier_runs(tmp_path):
+    config = replay_parser_settings.model_copy(update={"ARCHIVE_DIR": str(tmp_path)})
+    prefix = config.ARCHIVE_S3_PREFIX
+    other_season = f"{prefix}season_10/segment_old_0000.zz"
+    s3_client = FakeS3Client([f"{prefix}season_1/segment_old_0000.zz", other_season])
+
+    writer = write_season(tmp_path, 1, range(1, 50))
+    upload_season(s3_client, config, writer)
+
+    segment_keys = {
+        f"{prefix}{path.relative_to(tmp_path).as_posix()}"
+        for path in writer.segment_paths
+    }
+    assert s3_client.keys == {
+        *segment_keys,
+        f"{prefix}season_1/{INDEX_FILENAME}",
+        other_season,
+    }
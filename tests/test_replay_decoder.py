@@ -0,0 +1,86 @@
+import json
+
+import pytest
+
+from gfwldata.transformers import replay_decoder
+from gfwldata.transformers.replay_decoder import ReplayValidationError, decode_replay
+from gfwldata.transformers.replay_parser import ReplayParser
+
+pytest.importorskip("msgspec")
+
+PLAYERS = {"player1": {"username": "alice"}, "player2": {"username": "bob"}}
+
+
+def replay(*plays: dict, **fields) -> dict:
+    return {"date": "2024-01-01 00:00:00", **PLAYERS, "plays": list(plays), **fields}
+
+
+VALID_REPLAYS = {
+    "seconds as a string": replay({"seconds": "12", "play": "Draw card"}),
+    "seconds as a float": replay({"seconds": 1.5, "play": "Draw card"}),
+    "owner as an int": replay({"owner": 1, "log": {"public_log": "Drew card"}}),
+    "owner missing": replay({"play": "Draw card", "log": {"username": "alice"}}),
+    "username null": replay({"log": [{"username": None, "public_log": "Drew"}]}),
+    "log as a dict": replay({"log": {"username": "bob", "public_log": "Set"}}),
+    "log as a string": replay({"play": "Draw card", "log": "Drew card"}),
+    "log missing": replay({"play": "Shuffle deck"}),
+    "log null": replay({"play": "Shuffle deck", "log": None}),
+    "public_log as a number": replay({"log": [{"public_log": 5}]}),
+    "unknown fields": replay({"play": "Draw card", "extra": [1]}, conceal=False),
+    "no plays": replay(),
+}
+
+INVALID_REPLAYS = {
+    "not a dict": [],
+    "date missing": {**PLAYERS, "plays": []},
+    "date as an int": replay(date=20240101),
+    "player1 missing": {"date": "2024-01-01", "player2": {"username": "bob"}},
+    "username missing": replay(player2={}),
+    "username as an int": replay(player1={"username": 1}),
+    "plays missing": {"date": "2024-01-01", **PLAYERS},
+    "plays as a dict": replay(plays={}),
+    "play as a string": replay("Draw card"),
+}
+
+
+def decode_with_json(data: bytes, monkeypatch: pytest.MonkeyPatch) -> dict:
+    with monkeypatch.context() as patch:
+        patch.setattr(replay_decoder, "msgspec", None)
+        return decode_replay(data)
+
+
+def plays_records(replay_data: dict) -> list[dict]:
+    parser = ReplayParser.__new__(ReplayParser)
+    return parser._create_plays_df(replay_data).to_dict("records")
+
+
+@pytest.mark.parametrize("replay_data", VALID_REPLAYS.values(), ids=VALID_REPLAYS)
+def test_decoders_accept_the_same_replays(replay_data, monkeypatch):
+    data = json.dumps(replay_data).encode()
+
+    json_replay = decode_with_json(data, monkeypatch)
+    msgspec_replay = decode_replay(data)
+
+    # msgspec drops unread fields and fills missing ones, the parser sees no change
+    assert plays_records(msgspec_replay) == plays_records(json_replay)
+    for field in ("date", "player1", "player2"):
+        assert msgspec_replay[field] == json_replay[field]
+
+
+@pytest.mark.parametrize("replay_data", INVALID_REPLAYS.values(), ids=INVALID_REPLAYS)
+def test_decoders_reject_the_same_replays(replay_data, monkeypatch):
+    data = json.dumps(replay_data).encode()
+
+    with pytest.raises(ReplayValidationError):
+        decode_with_json(data, monkeypatch)
+
+    with pytest.raises(ReplayValidationError):
+        decode_replay(data)
+
+
+def test_decoders_reject_invalid_json(monkeypatch):
+    with pytest.raises(ReplayValidationError):
+        decode_with_json(b"{", monkeypatch)
+
+    with pytest.raises(ReplayValidationError):
+        decode_replay(b"{")
@@ -0,0 +1,80 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from gfwldata.config.replay import replay_settings
+from gfwldata.extractors.replay_extractor import BLANK_PAGE_URL, ReplayExtractor
+
+REPLAY_URL = "https://www.duelingbook.com/replay?id=2"
+
+
+class FakePage:
+    """A pooled page that logs its replay's JSON to the console on every navigation."""
+
+    def __init__(self, url: str, payload: dict):
+        self.url = url
+        self.payload = payload
+        self.listeners = []
+
+    def on(self, event: str, listener) -> None:
+        self.listeners.append(listener)
+
+    def remove_listener(self, event: str, listener) -> None:
+        self.listeners.remove(listener)
+
+    async def goto(self, url: str, **kwargs) -> None:
+        # Until it unloads, the previous replay can still log its JSON
+        self.log(self.payload)
+        self.url = url
+        self.payload = None
+        if url == REPLAY_URL:
+            self.payload = {"conceal": False, "plays": ["this replay"]}
+            self.log(self.payload)
+
+    def log(self, payload: dict | None) -> None:
+        if payload is None:
+            return
+
+        for listener in list(self.listeners):
+            listener(SimpleNamespace(text=json.dumps(payload)))
+
+
+class FakeBrowserPool:
+    def __init__(self, page: FakePage):
+        self.page = page
+
+    @asynccontextmanager
+    async def acquire_page(self):
+        yield self.page
+
+
+def extract(page: FakePage) -> dict:
+    config = replay_settings.model_copy(
+        update={"CAPTURE_MODE": "network", "REPLAY_RESPONSE_URL_PATTERN": None}
+    )
+    extractor = ReplayExtractor(config, FakeBrowserPool(page))
+    return asyncio.run(extractor.extract_replay_json(REPLAY_URL))
+
+
+def test_the_previous_replay_is_unloaded_before_listening():
+    # Neither payload carries an id, so only unloading tells them apart
+    page = FakePage(
+        "https://www.duelingbook.com/replay?id=1",
+        {"conceal": False, "plays": ["previous replay"]},
+    )
+
+    assert extract(page) == {"conceal": False, "plays": ["this replay"]}
+
+
+def test_fresh_pages_are_not_blanked_again():
+    page = FakePage(BLANK_PAGE_URL, None)
+
+    assert extract(page) == {"conceal": False, "plays": ["this replay"]}
+
+
+def test_only_payloads_of_another_replay_are_rejected():
+    assert ReplayExtractor._is_replay({"conceal": False}, 2)
+    assert ReplayExtractor._is_replay({"id": "2", "conceal": False}, 2)
+    assert not ReplayExtractor._is_replay({"id": 1, "conceal": False}, 2)
+    assert not ReplayExtractor._is_replay(None, 2)
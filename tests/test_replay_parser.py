@@ -0,0 +1,319 @@
+import re
+import uuid
+
+import pandas as pd
+import pytest
+
+from gfwldata.config.replay_parser import replay_parser_settings
+from gfwldata.transformers.replay_parser import ReplayParser
+from scripts.dev.generate_synthetic_replays import generate_replays
+
+
+@pytest.fixture
+def parser() -> ReplayParser:
+    """A parser without the deck classifier, which these tests don't predict with."""
+    parser = ReplayParser.__new__(ReplayParser)
+    parser.config = replay_parser_settings
+    return parser
+
+
+# Row-wise reference of the play annotations, as they were before column-wise ops
+
+
+def reference_plays_df(replay_data: dict) -> pd.DataFrame:
+    plays = []
+
+    for play in replay_data.get("plays"):
+        base = {
+            "seconds": play.get("seconds"),
+            "play": play.get("play"),
+            "owner": play.get("owner"),
+        }
+
+        logs = play.get("log")
+
+        if isinstance(logs, list):
+            for log in logs:
+                plays.append({**base, **log})
+        elif isinstance(logs, dict):
+            plays.append({**base, **logs})
+
+    return (
+        pd.json_normalize(plays)
+        .assign(username=lambda df: df["owner"].fillna(df["username"]))
+        .drop(columns="owner")
+    )
+
+
+def reference_card_name(row: pd.Series) -> str | None:
+    if row.play == "Duel message":
+        return None
+
+    for log in (row.private_log, row.public_log):
+        if not log:
+            continue
+
+        matches = re.findall(r'"([^"]*)"', str(log))
+        if matches:
+            return matches[0]
+
+    return None
+
+
+def reference_deck_change(row: pd.Series) -> int:
+    logs = [str(row.private_log), str(row.public_log)]
+
+    if any(
+        phrase in log
+        for log in logs
+        for phrase in ("Drew", "from Deck", "from top of deck")
+    ):
+        return 1
+
+    if any(
+        phrase in log
+        for log in logs
+        for phrase in ("to top of deck", "to bottom of deck")
+    ):
+        return -1
+
+    return 0
+
+
+# Per-game reference of games_df, as it was before the single groupby pass
+
+
+def reference_cards_df(plays_df: pd.DataFrame) -> pd.DataFrame:
+    return (
+        plays_df.dropna(subset="card_name")
+        .assign(
+            cum_deck_change=lambda df: df.groupby(
+                ["game_number", "username", "card_name"]
+            )["deck_change"].cumsum()
+        )
+        .groupby(["game_number", "username", "card_name"])
+        .agg(card_amount=("cum_deck_change", "max"))
+        .reset_index()
+        .query("card_amount > 0")
+    )
+
+
+def reference_game_winner(
+    player1: str, player2: str, game_df: pd.DataFrame
+) -> str | None:
+    game_loser = game_df.query("public_log in ['Admitted defeat', 'Lost Duel']")[
+        "username"
+    ]
+
+    if game_loser.empty:
+        return None
+
+    return player1 if game_loser.item() == player2 else player2
+
+
+def reference_games_df(replay_data: dict) -> pd.DataFrame:
+    plays_df = reference_plays_df(replay_data)
+    plays_df = plays_df.assign(
+        card_name=plays_df.apply(reference_card_name, axis=1),
+        deck_change=plays_df.apply(reference_deck_change, axis=1),
+        game_number=plays_df.public_log.str.contains("Chose to go").cumsum(),
+    )
+
+    played_at = pd.to_datetime(replay_data.get("date"))
+    player1 = replay_data.get("player1").get("username")
+    player2 = replay_data.get("player2").get("username")
+
+    games_data = []
+    games_base = {"played_at": played_at, "player1": player1, "player2": player2}
+    cards_df = reference_cards_df(plays_df)
+
+    for game in range(1, max(plays_df["game_number"]) + 1):
+        game_df = plays_df.query("game_number == @game")
+        player1_cards_df = cards_df.query(
+            "game_number == @game & username == @player1"
+        )[["card_name", "card_amount"]]
+        player2_cards_df = cards_df.query(
+            "game_number == @game & username == @player2"
+        )[["card_name", "card_amount"]]
+
+        games_data.append(
+            {
+                **games_base,
+                "game_number": game,
+                "game_winner": reference_game_winner(player1, player2, game_df),
+                "went_first": game_df.query("public_log == 'Chose to go first'")[
+                    "username"
+                ].item(),
+                "player1_cards": player1_cards_df.to_dict("records"),
+                "player2_cards": player2_cards_df.to_dict("records"),
+            }
+        )
+
+    return pd.DataFrame(games_data)
+
+
+def edge_case_replay() -> dict:
+    player1, player2 = "alice", "bob"
+
+    def play(play: str, owner: str | None, log) -> dict:
+        return {"seconds": 1, "play": play, "owner": owner, "log": log}
+
+    return {
+        "id": "edge-cases",
+        "date": "2024-01-01 00:00:00",
+        "player1": {"username": player1},
+        "player2": {"username": player2},
+        "plays": [
+            play(
+                "Duel message",
+                None,
+                {"username": player1, "public_log": "Chose to go first"},
+            ),
+            # A log as a dict
+            play(
+                "Draw card",
+                player1,
+                {
+                    "username": player1,
+                    "public_log": "Drew card",
+                    "private_log": 'Drew "Sangan"',
+                },
+            ),
+            # A play without a log
+            {"seconds": 2, "play": "Shuffle deck", "owner": player1},
+            # A message quoting a card
+            play(
+                "Duel message",
+                player2,
+                [{"username": player2, "public_log": 'Chain "Mirror Force"?'}],
+            ),
+            # Quotes only in the public log
+            play(
+                "Activate ST",
+                None,
+                [
+                    {
+                        "username": player2,
+                        "public_log": 'Activated "Scapegoat"',
+                        "private_log": "Activated a card",
+                    }
+                ],
+            ),
+            # Draws a card and returns one in the same play
+            play(
+                "Activate ST",
+                player2,
+                [
+                    {
+                        "username": player2,
+                        "public_log": 'Drew "Jinzo" and moved "Sangan" to top of deck',
+                    }
+                ],
+            ),
+            play(
+                "To T Deck",
+                player1,
+                [{"username": player1, "public_log": 'Moved "Sangan" to top of deck'}],
+            ),
+            play(
+                "Duel message",
+                player1,
+                {"username": player1, "public_log": "Admitted defeat"},
+            ),
+        ],
+    }
+
+
+def draw_replay() -> dict:
+    """Two drawn games, bob revealing no cards in the first, then one alice loses."""
+    player1, player2 = "alice", "bob"
+
+    def log(username: str, public_log: str, private_log: str = "") -> dict:
+        return {
+            "seconds": 1,
+            "play": "Draw card",
+            "owner": username,
+            "log": [
+                {
+                    "username": username,
+                    "public_log": public_log,
+                    "private_log": private_log,
+                }
+            ],
+        }
+
+    return {
+        "id": "draw",
+        "date": "2024-01-02 00:00:00",
+        "player1": {"username": player1},
+        "player2": {"username": player2},
+        "plays": [
+            log(player2, "Chose to go first"),
+            log(player1, "Drew card", 'Drew "Sangan"'),
+            log(player2, "Drew card"),
+            log(player2, "Chose to go first"),
+            log(player2, "Drew card", 'Drew "Jinzo"'),
+            log(player1, "Chose to go first"),
+            log(player1, "Drew card", 'Drew "Scapegoat"'),
+            log(player1, "Lost Duel"),
+        ],
+    }
+
+
+REPLAYS = [
+    *generate_replays(5, games=3, plays_per_game=200),
+    edge_case_replay(),
+    draw_replay(),
+]
+
+
+@pytest.mark.parametrize("replay_data", REPLAYS, ids=lambda replay: str(replay["id"]))
+def test_play_annotations_match_row_wise_reference(parser, replay_data):
+    plays_df = parser._create_plays_df(replay_data)
+    expected_df = reference_plays_df(replay_data)
+
+    # Missing card names are NaN column-wise and None row-wise
+    card_names = parser._extract_card_names(plays_df)
+    pd.testing.assert_series_equal(
+        card_names.astype(object).where(card_names.notna(), None),
+        expected_df.apply(reference_card_name, axis=1),
+        check_names=False,
+    )
+    pd.testing.assert_series_equal(
+        parser._calculate_deck_changes(plays_df),
+        expected_df.apply(reference_deck_change, axis=1),
+        check_names=False,
+        check_dtype=False,
+    )
+
+
+@pytest.mark.parametrize("replay_data", REPLAYS, ids=lambda replay: str(replay["id"]))
+def test_games_df_matches_row_wise_reference(parser, replay_data):
+    games_df = parser.parse_replay(replay_data, uuid.uuid4(), predict_deck_types=False)
+
+    pd.testing.assert_frame_equal(games_df, reference_games_df(replay_data))
+
+
+def test_edge_case_annotations(parser):
+    plays_df = parser._create_plays_df(edge_case_replay())
+    card_names = parser._extract_card_names(plays_df)
+
+    # The play without a log is skipped, and messages have no card names
+    assert len(plays_df) == 7
+    assert card_names.iloc[1] == "Sangan"
+    assert pd.isna(card_names.iloc[2])
+    assert card_names.iloc[3:6].tolist() == ["Scapegoat", "Jinzo", "Sangan"]
+    assert parser._calculate_deck_changes(plays_df).tolist()[1:6] == [1, 0, 0, 1, -1]
+
+
+def test_draws_and_players_without_cards(parser):
+    games_df = parser.parse_replay(
+        draw_replay(), uuid.uuid4(), predict_deck_types=False
+    )
+
+    assert games_df["game_winner"].tolist() == [None, None, "bob"]
+    assert games_df["player2_cards"].tolist() == [
+        [],
+        [{"card_name": "Jinzo", "card_amount": 1}],
+        [],
+    ]
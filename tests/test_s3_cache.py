@@ -0,0 +1,72 @@
+import hashlib
+import zlib
+
+import pytest
+
+from gfwldata.utils.s3_cache import S3ObjectCache
+
+
+@pytest.fixture
+def cache(tmp_path) -> S3ObjectCache:
+    return S3ObjectCache(tmp_path, max_bytes=1024**2)
+
+
+def test_get_returns_the_cached_body(cache):
+    body = b'{"id": 1}'
+    cache.put("bucket", "replays/1.json", f'"{hashlib.md5(body).hexdigest()}"', body)
+
+    assert cache.get("bucket", "replays/1.json") == body
+    assert cache.get_etag("bucket", "replays/1.json") == hashlib.md5(body).hexdigest()
+    assert cache.get("bucket", "replays/2.json") is None
+    assert cache.get("other", "replays/1.json") is None
+
+
+def test_etags_that_arent_md5s_are_served(cache):
+    # SSE-KMS, SSE-C and multipart ETags aren't the md5 of the body
+    cache.put("bucket", "kms", '"0123456789abcdef0123456789abcdef"', b"kms body")
+    cache.put("bucket", "multipart", '"0123456789abcdef-2"', b"multipart body")
+
+    assert cache.get("bucket", "kms") == b"kms body"
+    assert cache.get("bucket", "multipart") == b"multipart body"
+
+
+def test_delete_forgets_the_object(cache):
+    cache.put("bucket", "key", "etag", b"body")
+    cache.delete("bucket", "key")
+
+    assert cache.get("bucket", "key") is None
+    assert cache.get_etag("bucket", "key") is None
+
+
+def test_identical_bodies_share_a_blob(cache):
+    cache.put("bucket", "a", "etag", b"body")
+    cache.put("bucket", "b", "etag", b"body")
+    cache.delete("bucket", "a")
+
+    assert len(list(cache.blobs_dir.iterdir())) == 1
+    assert cache.get("bucket", "b") == b"body"
+
+
+def test_unreadable_blobs_are_dropped(cache):
+    cache.put("bucket", "key", "etag", b"body")
+    (cache.blobs_dir / "etag.zz").write_bytes(b"not zlib")
+
+    assert cache.get("bucket", "key") is None
+    assert cache.get_etag("bucket", "key") is None
+
+
+def test_least_recently_used_blobs_are_evicted(tmp_path):
+    bodies = {key: bytes(range(256)) * 4 + key.encode() for key in "abc"}
+    blob_size = len(zlib.compress(bodies["a"]))
+    cache = S3ObjectCache(tmp_path, max_bytes=blob_size * 2)
+
+    cache.put("bucket", "a", "etag-a", bodies["a"])
+    cache.put("bucket", "b", "etag-b", bodies["b"])
+    # Reading a makes b the least recently used
+    assert cache.get("bucket", "a") == bodies["a"]
+    cache.put("bucket", "c", "etag-c", bodies["c"])
+
+    assert cache.get("bucket", "b") is None
+    assert not (cache.blobs_dir / "etag-b.zz").exists()
+    assert cache.get("bucket", "a") == bodies["a"]
+    assert cache.get("bucket", "c") == bodies["c"]
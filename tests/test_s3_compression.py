@@ -0,0 +1,59 @@
+import gzip
+import json
+
+import pytest
+
+from gfwldata.utils.s3 import BaseSerializer, compress_body, decompress_body
+
+BODY = json.dumps({"id": 1, "plays": [{"play": "Draw card"}] * 50}).encode()
+
+
+@pytest.fixture(params=["gzip", "zstd"])
+def content_encoding(request) -> str:
+    if request.param == "zstd":
+        pytest.importorskip("zstandard")
+    return request.param
+
+
+def test_round_trip_with_content_encoding(content_encoding):
+    body = compress_body(BODY, content_encoding)
+
+    assert len(body) < len(BODY)
+    assert decompress_body(body, content_encoding) == BODY
+
+
+def test_content_encoding_is_sniffed_from_magic_bytes(content_encoding):
+    # Bodies read back from the local cache have no Content-Encoding header
+    assert decompress_body(compress_body(BODY, content_encoding)) == BODY
+
+
+def test_plain_bodies_are_returned_as_is():
+    assert decompress_body(BODY) == BODY
+    assert decompress_body(b"") == b""
+
+
+def test_gzip_output_is_deterministic():
+    # Same bodies get the same ETag, so the cache and skip checks still match
+    assert compress_body(BODY, "gzip") == compress_body(BODY, "gzip")
+    assert gzip.decompress(compress_body(BODY, "gzip")) == BODY
+
+
+def test_unsupported_content_encoding():
+    with pytest.raises(ValueError):
+        compress_body(BODY, "br")
+
+
+@pytest.mark.parametrize(
+    ("filetype", "content_encoding"),
+    [("json", None), ("json.gz", "gzip"), ("json.zst", "zstd")],
+)
+def test_serialize_data_names_the_content_encoding(filetype, content_encoding):
+    if content_encoding == "zstd":
+        pytest.importorskip("zstandard")
+
+    body, content_type, encoding = BaseSerializer().serialize_data(
+        json.loads(BODY), filetype
+    )
+
+    assert (content_type, encoding) == ("application/json", content_encoding)
+    assert decompress_body(body) == BODY
@@ -0,0 +1,119 @@
+import asyncio
+import uuid
+from collections import defaultdict
+
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+import scripts.run_scrape_replay_pipeline as pipeline
+from gfwldata.extractors.replay_extractor import ReplayExtractionError
+from gfwldata.utils.models import JobState
+from scripts.run_scrape_replay_pipeline import (
+    complete_uploaded_replays,
+    group_jobs_by_replay,
+    is_scrape_congestion,
+    process_replays,
+)
+
+
+class FakeJobStateWriter:
+    def __init__(self):
+        self.states = {}
+
+    def set_state(self, league_match_id, state):
+        self.states[league_match_id] = state
+
+
+def test_group_jobs_by_replay_collapses_shared_replays():
+    ids = [uuid.uuid4() for _ in range(4)]
+    jobs = [
+        (ids[0], "1_replay.json", "https://duelingbook.com/replay?id=1"),
+        (ids[1], "1_replay.json", "https://duelingbook.com/replay?id=1"),
+        (ids[2], "2_replay.json", "https://duelingbook.com/replay?id=2"),
+        (ids[3], "1_replay.json", "https://duelingbook.com/replay?id=1"),
+    ]
+
+    assert group_jobs_by_replay(jobs) == [
+        (
+            [ids[0], ids[1], ids[3]],
+            "1_replay.json",
+            "https://duelingbook.com/replay?id=1",
+        ),
+        ([ids[2]], "2_replay.json", "https://duelingbook.com/replay?id=2"),
+    ]
+    assert group_jobs_by_replay([]) == []
+
+
+def test_replays_uploaded_by_earlier_claims_are_not_scraped_again():
+    writer = FakeJobStateWriter()
+    split_job, new_job = uuid.uuid4(), uuid.uuid4()
+    uploaded_keys = {"1_replay.json"}
+
+    # A replay's jobs can be split across two claims of LEASE_CLAIM_SIZE jobs
+    replays = group_jobs_by_replay(
+        [
+            (split_job, "1_replay.json", "https://duelingbook.com/replay?id=1"),
+            (new_job, "2_replay.json", "https://duelingbook.com/replay?id=2"),
+        ]
+    )
+
+    assert complete_uploaded_replays(writer, replays, uploaded_keys) == [
+        ([new_job], "2_replay.json", "https://duelingbook.com/replay?id=2")
+    ]
+    assert writer.states == {split_job: JobState.S3_COMPLETED}
+
+
+def test_only_timeouts_and_browser_errors_are_congestion():
+    timed_out = ReplayExtractionError("Timeout waiting for replay JSON")
+    timed_out.__cause__ = asyncio.TimeoutError()
+
+    assert is_scrape_congestion(PlaywrightTimeoutError("Timeout 30000ms exceeded"))
+    assert is_scrape_congestion(PlaywrightError("net::ERR_CONNECTION_RESET"))
+    assert is_scrape_congestion(asyncio.TimeoutError())
+    assert is_scrape_congestion(timed_out)
+    assert not is_scrape_congestion(ReplayExtractionError("Replay JSON not found"))
+    assert not is_scrape_congestion(ValueError())
+
+
+def test_replays_split_across_claims_are_scraped_once(monkeypatch):
+    writer = FakeJobStateWriter()
+    first_job, second_job = uuid.uuid4(), uuid.uuid4()
+    url = "https://duelingbook.com/replay?id=1"
+    scraped = []
+
+    async def process_job_wrapper(*args):
+        *_, uploaded_keys, (job_ids, s3_key, _) = args
+        scraped.append(job_ids)
+        await asyncio.sleep(0.01)
+        uploaded_keys.add(s3_key)
+        for job_id in job_ids:
+            writer.set_state(job_id, JobState.S3_COMPLETED)
+
+    monkeypatch.setattr(pipeline, "process_job_wrapper", process_job_wrapper)
+
+    async def main():
+        replays = asyncio.Queue()
+        for replay in [
+            ([first_job], "1_replay.json", url),
+            ([second_job], "1_replay.json", url),
+            None,
+            None,
+        ]:
+            replays.put_nowait(replay)
+
+        # The second copy is taken while the first is still being scraped
+        uploaded_keys, locks = set(), defaultdict(asyncio.Lock)
+        await asyncio.gather(
+            *(
+                process_replays(None, None, writer, None, uploaded_keys, replays, locks)
+                for _ in range(2)
+            )
+        )
+
+    asyncio.run(main())
+
+    assert scraped == [[first_job]]
+    assert writer.states == {
+        first_job: JobState.S3_COMPLETED,
+        second_job: JobState.S3_COMPLETED,
+    }